@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import Token
+
+
+class TokenAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'created',
+    )
+    fields = ('user',)
+    search_fields = ('user__username',)
+
+
+admin.site.register(Token, TokenAdmin)
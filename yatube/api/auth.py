@@ -0,0 +1,64 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .models import Token
+
+User = get_user_model()
+PREFIX = 'Token '
+
+
+class AuthenticationFailed(Exception):
+    pass
+
+
+class TokenUser(SimpleLazyObject):
+    """Пользователь токена: pk известен сразу, остальное - по обращению.
+
+    Так проверка ETag для личных ресурсов не обращается к базе.
+    """
+
+    def __init__(self, pk):
+        super().__init__(lambda: User.objects.get(pk=pk))
+        self.__dict__['pk'] = pk
+
+
+def _cache_key(key):
+    return 'api_token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget(key):
+    cache.delete(_cache_key(key))
+
+
+def user_id(key):
+    """Id владельца токена или 0; ответ базы кэшируется."""
+    cache_key = _cache_key(key)
+    pk = cache.get(cache_key)
+    if pk is None:
+        pk = Token.objects.filter(
+            key=key, user__is_active=True
+        ).values_list('user_id', flat=True).first() or 0
+        cache.set(cache_key, pk, settings.API_TOKEN_CACHE_TIME)
+    return pk
+
+
+def authenticate(request):
+    """Пользователь запроса по токену; без заголовка - аноним.
+
+    Сессия сайта в API не используется, поэтому и CSRF не нужен.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if not header:
+        request.user = AnonymousUser()
+        return
+    if not header.startswith(PREFIX):
+        raise AuthenticationFailed('Ожидается заголовок "Token <ключ>"')
+    pk = user_id(header[len(PREFIX):].strip())
+    if not pk:
+        raise AuthenticationFailed('Неверный токен')
+    request.user = TokenUser(pk)
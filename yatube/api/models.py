@@ -0,0 +1,38 @@
+import secrets
+
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class Token(models.Model):
+    """Ключ доступа к API, передаётся в заголовке Authorization."""
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания',
+    )
+    key = models.CharField(
+        max_length=40,
+        primary_key=True,
+        verbose_name='Ключ',
+    )
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='api_token',
+        verbose_name='Пользователь',
+    )
+
+    class Meta:
+        verbose_name = 'Токен API'
+        verbose_name_plural = 'Токены API'
+
+    def __str__(self) -> str:
+        return self.user.username
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = secrets.token_hex(20)
+        super().save(*args, **kwargs)
@@ -0,0 +1,153 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from posts.models import Follow, Group, Post, User
+from posts.utils import encode_cursor
+
+from .models import Token
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='Writer', password='secret'
+        )
+        self.reader = User.objects.create_user(username='Reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {number}'
+            )
+            for number in range(5)
+        ]
+        self.token = Token.objects.create(user=self.reader).key
+
+    def auth(self, key=None):
+        return {'HTTP_AUTHORIZATION': f'Token {key or self.token}'}
+
+    def send(self, method, url, data, **extra):
+        return getattr(self.client, method)(
+            url, json.dumps(data), content_type='application/json', **extra
+        )
+
+    def test_cursor_pages_and_sparse_fields(self):
+        url = reverse('api:post_list')
+        first = self.client.get(url, {'limit': 2, 'fields': 'id,text'})
+        data = first.json()
+        self.assertEqual(
+            data['results'],
+            [
+                {'id': post.pk, 'text': post.text}
+                for post in self.posts[:-3:-1]
+            ],
+        )
+        self.assertIsNone(data['previous'])
+        second = self.client.get(data['next']).json()
+        self.assertEqual(
+            [item['id'] for item in second['results']],
+            [post.pk for post in self.posts[2:0:-1]],
+        )
+        self.assertEqual(
+            self.client.get(url, {'fields': 'nope'}).status_code, 400
+        )
+        self.assertEqual(
+            self.client.get(url, {'cursor': 'broken'}).status_code, 400
+        )
+        cursor = encode_cursor(['nope', 1], 2)
+        self.assertEqual(
+            self.client.get(url, {'cursor': cursor}).status_code, 400
+        )
+
+    def test_unchanged_resource_is_304_without_queries(self):
+        url = reverse('api:post_detail', args=(self.posts[0].pk,))
+        response = self.client.get(url)
+        self.assertEqual(response.json()['group'], 'group')
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(cached.status_code, 304)
+        self.posts[0].text = 'Изменённый'
+        self.posts[0].save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_token_and_authorship(self):
+        response = self.send(
+            'post',
+            reverse('api:token'),
+            {'username': 'Writer', 'password': 'secret'},
+        )
+        key = response.json()['token']
+        url = reverse('api:post_detail', args=(self.posts[0].pk,))
+        self.assertEqual(
+            self.send('patch', url, {'text': 'Чужое'}, **self.auth())
+            .status_code,
+            403,
+        )
+        response = self.send('patch', url, {'text': 'Своё'}, **self.auth(key))
+        self.assertEqual(response.json()['text'], 'Своё')
+        self.assertEqual(response.json()['group'], 'group')
+        response = self.send(
+            'post',
+            reverse('api:post_list'),
+            {'text': 'Новый', 'group': 'missing'},
+            **self.auth(key),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('group', response.json()['errors'])
+        self.assertEqual(
+            self.client.delete(url, **self.auth(key)).status_code, 204
+        )
+        self.assertFalse(Post.objects.filter(pk=self.posts[0].pk).exists())
+
+    def test_authentication_errors(self):
+        url = reverse('api:post_list')
+        self.assertEqual(
+            self.send('post', url, {'text': 'Пост'}).status_code, 401
+        )
+        response = self.client.get(url, **self.auth('wrong'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        response = self.client.get(reverse('api:post_detail', args=(0,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', response.json())
+
+    def test_follows_and_comments(self):
+        url = reverse('api:follow_list')
+        etag = self.client.get(url, **self.auth())['ETag']
+        response = self.send('post', url, {'author': 'Writer'}, **self.auth())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.send('post', url, {'author': 'Writer'}, **self.auth())
+            .status_code,
+            409,
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth())
+        self.assertEqual(response.json()['results'], [{'author': 'Writer'}])
+        self.client.delete(
+            reverse('api:follow_delete', args=('Writer',)), **self.auth()
+        )
+        self.assertFalse(Follow.objects.exists())
+        comments = reverse('api:comment_list', args=(self.posts[1].pk,))
+        self.send('post', comments, {'text': 'Первый'}, **self.auth())
+        self.send('post', comments, {'text': 'Второй'}, **self.auth())
+        results = self.client.get(comments).json()['results']
+        self.assertEqual(
+            [item['text'] for item in results], ['Первый', 'Второй']
+        )
+        reply = self.send(
+            'post', comments,
+            {'text': 'Ответ', 'parent': results[0]['id']}, **self.auth(),
+        ).json()
+        self.assertEqual(
+            (reply['parent'], reply['depth']), (results[0]['id'], 1)
+        )
+        group = self.client.get(reverse('api:group_detail', args=('group',)))
+        self.assertEqual(group.json()['post_count'], 5)
@@ -0,0 +1,337 @@
+import json
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import authenticate as check_password
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from posts.caching import conditional, slug_scope
+from posts.forms import PostForm, ReplyForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import InvalidCursor, CursorPaginator
+
+from .auth import AuthenticationFailed, authenticate
+from .models import Token
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.errors = errors
+
+
+def error(status, message, errors=None):
+    data = {'detail': message}
+    if errors:
+        data['errors'] = errors
+    return JsonResponse(data, status=status)
+
+
+def api_view(*methods):
+    """Общая обвязка API: методы, токен и ошибки в виде JSON."""
+    allowed = set(methods) | ({'HEAD'} if 'GET' in methods else set())
+
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                response = error(
+                    HTTPStatus.METHOD_NOT_ALLOWED, 'Метод не разрешён'
+                )
+                response['Allow'] = ', '.join(sorted(allowed))
+                return response
+            try:
+                authenticate(request)
+                response = view(request, *args, **kwargs)
+            except AuthenticationFailed as failure:
+                response = error(HTTPStatus.UNAUTHORIZED, str(failure))
+                response['WWW-Authenticate'] = 'Token'
+            except ApiError as failure:
+                response = error(
+                    failure.status, failure.message, failure.errors
+                )
+            except Http404:
+                response = error(HTTPStatus.NOT_FOUND, 'Не найдено')
+            response['Vary'] = 'Authorization'
+            return response
+        return wrapper
+    return decorator
+
+
+def require_user(request):
+    # pk токена известен без запроса к базе, см. auth.TokenUser.
+    if request.user.pk is None:
+        raise ApiError(HTTPStatus.UNAUTHORIZED, 'Нужен токен')
+
+
+def payload(request):
+    if request.content_type == 'multipart/form-data':
+        return request.POST.dict()
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, 'Тело запроса - не JSON')
+    if not isinstance(data, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, 'Ожидается JSON-объект')
+    return data
+
+
+def invalid(form):
+    return ApiError(
+        HTTPStatus.BAD_REQUEST,
+        'Данные не прошли проверку',
+        {
+            field: [item['message'] for item in items]
+            for field, items in form.errors.get_json_data().items()
+        },
+    )
+
+
+def sparse(request, items):
+    """Оставляет в объектах только поля из ?fields=a,b."""
+    names = request.GET.get('fields')
+    if not names:
+        return items
+    names = [name for name in names.split(',') if name]
+    unknown = set(names) - set(items[0]) if items else set()
+    if unknown:
+        raise ApiError(
+            HTTPStatus.BAD_REQUEST,
+            'Неизвестные поля: ' + ', '.join(sorted(unknown)),
+        )
+    return [{name: item[name] for name in names} for item in items]
+
+
+def page_url(request, cursor):
+    if not cursor:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def paginated(request, queryset, serialize, **options):
+    """Страница списка по курсору: results, next и previous."""
+    try:
+        limit = min(
+            int(request.GET.get('limit', settings.API_PAGE_SIZE)),
+            settings.API_MAX_PAGE_SIZE,
+        )
+        if limit < 1:
+            raise ValueError(limit)
+        page = CursorPaginator(queryset, limit, **options).page(
+            request.GET.get('cursor')
+        )
+    except (InvalidCursor, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, 'Неверный cursor или limit')
+    return JsonResponse({
+        'results': sparse(request, [serialize(obj) for obj in page]),
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    })
+
+
+def single(request, data, status=HTTPStatus.OK):
+    return JsonResponse(sparse(request, [data])[0], status=status)
+
+
+def post_data(post):
+    return {
+        'id': post.pk,
+        'author': post.author.username,
+        'comment_count': post.comment_count,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'pub_date': post.pub_date.isoformat(),
+        'text': post.text,
+        'thumbnails': post.thumbnail_set,
+        'url': reverse('posts:post_detail', args=(post.pk,)),
+    }
+
+
+def group_data(group):
+    return {
+        'id': group.pk,
+        'description': group.description,
+        'post_count': group.post_count,
+        'slug': group.slug,
+        'title': group.title,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'created': comment.created.isoformat(),
+        'depth': comment.depth,
+        'parent': comment.parent_id,
+        'post': comment.post_id,
+        'text': comment.text,
+    }
+
+
+def follow_data(follow):
+    return {'author': follow.author.username}
+
+
+def post_form(request, post=None):
+    """PostForm по данным API; группа передаётся слагом."""
+    data = payload(request)
+    if post is not None:
+        data = {
+            'text': post.text,
+            'group': post.group.slug if post.group_id else None,
+            **data,
+        }
+    slug = data.get('group')
+    if slug:
+        group = Group.objects.filter(slug=slug).values_list(
+            'pk', flat=True
+        ).first()
+        if group is None:
+            raise ApiError(
+                HTTPStatus.BAD_REQUEST,
+                'Данные не прошли проверку',
+                {'group': [f'Группы {slug} нет']},
+            )
+        data['group'] = group
+    form = PostForm(data, files=request.FILES or None, instance=post)
+    if not form.is_valid():
+        raise invalid(form)
+    return form
+
+
+@api_view('POST')
+def token(request):
+    """Выдаёт токен по логину и паролю."""
+    data = payload(request)
+    user = check_password(
+        request,
+        username=data.get('username'),
+        password=data.get('password'),
+    )
+    if user is None:
+        raise ApiError(HTTPStatus.BAD_REQUEST, 'Неверный логин или пароль')
+    key = Token.objects.get_or_create(user=user)[0].key
+    return JsonResponse({'token': key})
+
+
+@api_view('GET', 'POST')
+@conditional(lambda request: ['posts'])
+def post_list(request):
+    if request.method == 'POST':
+        require_user(request)
+        post = post_form(request).save(commit=False)
+        post.author = request.user
+        post.save()
+        response = single(request, post_data(post), HTTPStatus.CREATED)
+        response['Location'] = reverse('api:post_detail', args=(post.pk,))
+        return response
+    queryset = Post.objects.feed()
+    if 'group' in request.GET:
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return paginated(request, queryset, post_data)
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+@conditional(lambda request, post_id: [f'post:{post_id}'])
+def post_detail(request, post_id):
+    if request.method == 'GET':
+        post = get_object_or_404(Post.objects.feed(), pk=post_id)
+        return single(request, post_data(post))
+    require_user(request)
+    post = get_object_or_404(Post, pk=post_id)
+    if post.author_id != request.user.pk:
+        raise ApiError(HTTPStatus.FORBIDDEN, 'Менять пост может только автор')
+    if request.method == 'DELETE':
+        post.delete()
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+    return single(request, post_data(post_form(request, post).save()))
+
+
+@api_view('GET', 'POST')
+@conditional(lambda request, post_id: [f'post:{post_id}'])
+def comment_list(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method == 'POST':
+        require_user(request)
+        form = ReplyForm(payload(request), instance=Comment(post=post))
+        if not form.is_valid():
+            raise invalid(form)
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.save()
+        return single(request, comment_data(comment), HTTPStatus.CREATED)
+    return paginated(
+        request,
+        Comment.objects.filter(post=post).select_related('author')
+        .order_by('created', 'id'),
+        comment_data,
+        ordering=('created', 'id'),
+    )
+
+
+@api_view('GET')
+@conditional(lambda request: ['posts'])
+def group_list(request):
+    return paginated(
+        request, Group.objects.order_by('id'), group_data, ordering=('id',)
+    )
+
+
+@api_view('GET')
+@conditional(lambda request, slug: [slug_scope(slug)])
+def group_detail(request, slug):
+    return single(request, group_data(get_object_or_404(Group, slug=slug)))
+
+
+@api_view('GET', 'POST')
+@conditional(
+    lambda request: [f'follows:{request.user.pk}'], per_user=True
+)
+def follow_list(request):
+    require_user(request)
+    if request.method == 'POST':
+        author = get_object_or_404(
+            User, username=payload(request).get('author')
+        )
+        if author.pk == request.user.pk:
+            raise ApiError(
+                HTTPStatus.BAD_REQUEST, 'Нельзя подписаться на себя'
+            )
+        try:
+            with transaction.atomic():
+                follow = Follow.objects.create(
+                    user=request.user, author=author
+                )
+        except IntegrityError:
+            raise ApiError(HTTPStatus.CONFLICT, 'Подписка уже есть')
+        return single(request, follow_data(follow), HTTPStatus.CREATED)
+    return paginated(
+        request,
+        Follow.objects.filter(user=request.user.pk).select_related('author')
+        .order_by('-id'),
+        follow_data,
+        ordering=('-id',),
+    )
+
+
+@api_view('DELETE')
+def follow_delete(request, username):
+    require_user(request)
+    deleted, _ = Follow.objects.filter(
+        user=request.user.pk, author__username=username
+    ).delete()
+    if not deleted:
+        raise Http404
+    return HttpResponse(status=HTTPStatus.NO_CONTENT)
@@ -0,0 +1,142 @@
+"""Мост ASGI -> WSGI для Django 2.2, который сам ASGI не умеет.
+
+Соединение с клиентом - чтение тела запроса и отправку ответа - ведёт
+цикл событий ASGI-сервера, а Django работает в отдельном пуле потоков.
+Поток занят только пока view обращается к базе и кэшу, поэтому
+медленные клиенты не держат потоки, а цикл событий не блокируется.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Тело запроса крупнее этого размера (картинки) уходит во временный файл.
+BODY_MEMORY_LIMIT: int = 2 ** 20
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def _latin1(value):
+    return value.decode('latin1') if isinstance(value, bytes) else value
+
+
+def build_environ(scope, body):
+    """WSGI environ по ASGI scope; body - файл с телом запроса."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI передаёт путь байтами, упакованными в latin-1.
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+        'QUERY_STRING': _latin1(scope.get('query_string', b'')),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = _latin1(name).upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = _latin1(value)
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class WsgiBridge:
+    """ASGI-приложение поверх WSGI-приложения и пула из threads потоков."""
+
+    def __init__(self, wsgi_application, threads):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемое соединение {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_LIMIT)
+        try:
+            await self.read_body(receive, body)
+            body.seek(0)
+            status, headers, content = await (
+                asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.run, build_environ(scope, body)
+                )
+            )
+        except ClientDisconnected:
+            return
+        finally:
+            body.close()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    @staticmethod
+    async def read_body(receive, body):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                return
+
+    def run(self, environ):
+        """Вызов WSGI-приложения целиком в одном потоке пула.
+
+        Ответ собирается полностью: close() шлёт request_finished, и
+        Django закрывает соединения с базой того же потока.
+        """
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        result = self.wsgi_application(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        status, headers = started
+        return (
+            int(status.split(' ', 1)[0]),
+            [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ],
+            content,
+        )
@@ -0,0 +1,51 @@
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = {
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'pylibmc': 'django.core.cache.backends.memcached.PyLibMCCache',
+    'redis': 'core.cache.redis.RedisCache',
+}
+
+
+def parse_cache_url(url, key_prefix=''):
+    """Собирает настройки для settings.CACHES из адреса вида CACHE_URL.
+
+    Примеры: redis://:password@host:6379/0?max_connections=20,
+    memcached://host1:11211,host2:11211, file:///var/tmp/yatube,
+    db://cache_table, locmem://.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in BACKENDS:
+        raise ImproperlyConfigured(
+            f'Неизвестный бэкенд кэша в CACHE_URL: {parts.scheme}'
+        )
+    config = {
+        'BACKEND': BACKENDS[parts.scheme],
+        'KEY_PREFIX': key_prefix,
+    }
+    options = {
+        name.upper(): value for name, value in parse_qsl(parts.query)
+    }
+    if 'TIMEOUT' in options:
+        config['TIMEOUT'] = int(options.pop('TIMEOUT'))
+    if parts.scheme == 'redis':
+        config['LOCATION'] = (
+            f'{parts.hostname or "localhost"}:{parts.port or 6379}'
+        )
+        options['DB'] = parts.path.lstrip('/') or '0'
+        if parts.password:
+            options['PASSWORD'] = unquote(parts.password)
+    elif parts.scheme in ('memcached', 'pylibmc'):
+        config['LOCATION'] = parts.netloc.split(',')
+    elif parts.scheme == 'file':
+        config['LOCATION'] = parts.path
+    else:
+        config['LOCATION'] = parts.netloc or parts.path.lstrip('/')
+    if options:
+        config['OPTIONS'] = options
+    return config
@@ -0,0 +1,290 @@
+import os
+import pickle
+import socket
+import threading
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCAN_COUNT: int = 1000
+# incr для существующего ключа: проверка и сдвиг выполняются на сервере
+# одним шагом, так что удалённый между ними ключ не создаётся заново.
+INCR_SCRIPT = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end"
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class RedisError(Exception):
+    pass
+
+
+class Connection:
+    """Одно соединение с сервером, говорящим на протоколе RESP."""
+
+    def __init__(self, host, port, db=0, password=None, socket_timeout=None):
+        self.sock = socket.create_connection((host, port), socket_timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile('rb')
+        if password:
+            self.execute('AUTH', password)
+        if db:
+            self.execute('SELECT', db)
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    @staticmethod
+    def _pack(args):
+        chunks = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            chunks.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(chunks)
+
+    def _read(self):
+        line = self.file.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Соединение с кэшем закрыто')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            return RedisError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length == -1:
+                return None
+            return self.file.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(rest)
+            if length == -1:
+                return None
+            return [self._read() for _ in range(length)]
+        raise ConnectionError(f'Неизвестный ответ кэша: {line!r}')
+
+    def pipeline(self, commands):
+        """Отправляет команды одним пакетом и читает все ответы."""
+        self.sock.sendall(b''.join(self._pack(args) for args in commands))
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+
+class ConnectionPool:
+    """Пул соединений процесса; после fork соединения родителя не берутся."""
+
+    def __init__(self, max_connections=50, **params):
+        self.max_connections = max_connections
+        self.params = params
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+
+    @contextmanager
+    def connection(self):
+        if self.pid != os.getpid():
+            self._reset()
+        if not self._slots.acquire(timeout=self.params['socket_timeout']):
+            raise RedisError('Все соединения с кэшем заняты')
+        try:
+            try:
+                connection = self._idle.pop()
+            except IndexError:
+                connection = Connection(**self.params)
+            try:
+                yield connection
+            except (ConnectionError, OSError):
+                connection.close()
+                raise
+            finally:
+                if connection.sock.fileno() != -1:
+                    self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+
+def get_pool(host, port, **params):
+    """Общий пул на процесс: Django создаёт бэкенд кэша в каждом потоке."""
+    key = (host, port, *sorted(params.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(host=host, port=port, **params)
+        return _pools[key]
+
+
+class RedisCache(BaseCache):
+    """Бэкенд кэша для Redis и совместимых с ним серверов.
+
+    Целые числа хранятся как есть, чтобы incr выполнялся на сервере
+    атомарно; остальные значения сериализуются pickle.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        host, _, port = server.rpartition(':')
+        self._pool = get_pool(
+            host or 'localhost',
+            int(port or 6379),
+            db=int(options.get('DB', 0)),
+            password=options.get('PASSWORD'),
+            max_connections=int(options.get('MAX_CONNECTIONS', 50)),
+            socket_timeout=float(options.get('SOCKET_TIMEOUT', 5)),
+        )
+
+    def _execute(self, *args):
+        with self._pool.connection() as connection:
+            return connection.execute(*args)
+
+    def _pipeline(self, commands):
+        with self._pool.connection() as connection:
+            return connection.pipeline(commands)
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(data):
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def _expiry(self, timeout):
+        """Время жизни в миллисекундах; None - бессрочно."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(0, int(timeout * 1000))
+
+    def _set_command(self, key, value, expiry, only_new=False):
+        command = ['SET', key, self._encode(value)]
+        if expiry is not None:
+            command += ['PX', expiry]
+        if only_new:
+            command.append('NX')
+        return command
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            return not self._execute('EXISTS', key)
+        return self._execute(
+            *self._set_command(key, value, expiry, only_new=True)
+        ) is not None
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = self._execute('GET', key)
+        return default if data is None else self._decode(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            self._execute('DEL', key)
+        else:
+            self._execute(*self._set_command(key, value, expiry))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            exists, _ = self._pipeline([('EXISTS', key), ('PERSIST', key)])
+            return bool(exists)
+        if expiry == 0:
+            return bool(self._execute('DEL', key))
+        return bool(self._execute('PEXPIRE', key, expiry))
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._execute('DEL', key))
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._execute('EXISTS', key))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = self._execute('EVAL', INCR_SCRIPT, 1, key, delta)
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        values = self._execute('MGET', *made)
+        return {
+            made[key]: self._decode(data)
+            for key, data in zip(made, values) if data is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        expiry = self._expiry(timeout)
+        commands = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            if expiry == 0:
+                commands.append(('DEL', key))
+            else:
+                commands.append(self._set_command(key, value, expiry))
+        self._pipeline(commands)
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        if keys:
+            self._execute('DEL', *keys)
+
+    def clear(self):
+        """Удаляет только ключи своего префикса, если он задан."""
+        if not self.key_prefix:
+            self._execute('FLUSHDB')
+            return
+        cursor = b'0'
+        pattern = f'{self.key_prefix}:*'
+        while True:
+            cursor, keys = self._execute(
+                'SCAN', cursor, 'MATCH', pattern, 'COUNT', SCAN_COUNT
+            )
+            if keys:
+                self._execute('DEL', *keys)
+            if cursor in (b'0', '0'):
+                break
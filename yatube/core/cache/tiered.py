@@ -0,0 +1,213 @@
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+
+METRICS_PREFIX = 'cache_metrics:'
+instances = {}
+# Функции observer(экземпляр, метрика, значение), которые узнают о
+# каждом событии кэша: так core.instrumentation считает их по запросам.
+observers = []
+METRICS = (
+    'l1_hits',
+    'l2_hits',
+    'misses',
+    'rebuilds',
+    'early_rebuilds',
+    'lock_waits',
+)
+
+
+class LocalLRU:
+    """Небольшой LRU-кэш процесса со сроком жизни записей."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CacheMetrics:
+    """Счётчики кэша в процессе, которые периодически суммируются в L2.
+
+    Экземпляры с listed попадают в instances и видны на /metrics/cache/.
+    """
+
+    listed = True
+    metric_names = METRICS
+
+    def __init__(self, name, alias='default', flush_interval=5,
+                 metric_names=None):
+        self.name = name
+        if metric_names is not None:
+            self.metric_names = metric_names
+        self.alias = alias
+        self.flush_interval = flush_interval
+        self.metrics = Counter()
+        self._pending = Counter()
+        self._flushed = time.monotonic()
+        self._metrics_lock = threading.Lock()
+        if self.listed:
+            instances[name] = self
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def count(self, metric, value=1):
+        """Прибавляет value к счётчику metric."""
+        if value:
+            self._count_many({metric: value})
+
+    def _count_many(self, values):
+        for metric, value in values.items():
+            for observer in observers:
+                observer(self, metric, value)
+        with self._metrics_lock:
+            self.metrics.update(values)
+            self._pending.update(values)
+            if time.monotonic() - self._flushed < self.flush_interval:
+                return
+            pending, self._pending = self._pending, Counter()
+            self._flushed = time.monotonic()
+        self._schedule_flush(pending)
+
+    def _schedule_flush(self, pending):
+        """Плановый сброс по flush_interval; здесь - сразу."""
+        self._flush(pending)
+
+    def _flush(self, pending):
+        """Сбрасывает счётчики процесса в L2, где они суммируются."""
+        for metric, value in pending.items():
+            if not value:
+                continue
+            key = f'{METRICS_PREFIX}{self.name}:{metric}'
+            # Ключ обычно уже есть: один incr вместо add и incr.
+            try:
+                self.shared.incr(key, value)
+            except ValueError:
+                if not self.shared.add(key, value, None):
+                    self.shared.incr(key, value)
+
+    def flush_metrics(self):
+        with self._metrics_lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed = time.monotonic()
+        self._flush(pending)
+
+    def shared_metrics(self):
+        """Счётчики, собранные со всех процессов."""
+        keys = {
+            f'{METRICS_PREFIX}{self.name}:{metric}': metric
+            for metric in self.metric_names
+        }
+        values = self.shared.get_many(list(keys))
+        return {metric: values.get(key, 0) for key, metric in keys.items()}
+
+
+class TwoTierCache(CacheMetrics):
+    """L1 в памяти процесса перед общим L2 с защитой от "толпы".
+
+    Значения в L2 хранятся вместе со временем их вычисления: запись
+    пересчитывается заранее с вероятностью, растущей к концу срока жизни
+    (XFetch), а при промахе пересчитывает только тот процесс, что взял
+    блокировку - остальные ждут готовое значение.
+    """
+
+    def __init__(self, name, alias='default', max_entries=256,
+                 local_timeout=60, beta=1.0, lock_timeout=10,
+                 flush_interval=5):
+        super().__init__(name, alias, flush_interval)
+        self.beta = beta
+        self.local = LocalLRU(max_entries)
+        self.local_timeout = local_timeout
+        self.lock_timeout = lock_timeout
+
+    def _store(self, key, compute, timeout):
+        started = time.monotonic()
+        value = compute()
+        if value is not None:
+            delta = time.monotonic() - started
+            expires = time.time() + timeout
+            self.shared.set(key, (value, delta, expires), timeout)
+            self.local.set(key, value, min(timeout, self.local_timeout))
+        return value
+
+    def get_or_set(self, key, compute, timeout):
+        """Значение по ключу; при промахе - compute(), None не кэшируется."""
+        value = self.local.get(key)
+        if value is not None:
+            self.count('l1_hits')
+            return value
+        lock_key = key + ':lock'
+        item = self.shared.get(key)
+        if item is not None:
+            value, delta, expires = item
+            early = time.time() - delta * self.beta * math.log(
+                1 - random.random()
+            ) >= expires
+            if not early or not self.shared.add(
+                lock_key, 1, self.lock_timeout
+            ):
+                self.count('l2_hits')
+                self.local.set(key, value, min(
+                    self.local_timeout, max(expires - time.time(), 1)
+                ))
+                return value
+            self.count('early_rebuilds')
+            locked = True
+        else:
+            self.count('misses')
+            locked = self.shared.add(lock_key, 1, self.lock_timeout)
+            if not locked:
+                self.count('lock_waits')
+                value = self._wait(key, lock_key)
+                if value is not None:
+                    return value
+        self.count('rebuilds')
+        try:
+            return self._store(key, compute, timeout)
+        finally:
+            if locked:
+                self.shared.delete(lock_key)
+
+    def _wait(self, key, lock_key):
+        """Ждёт, пока значение посчитает процесс, взявший блокировку."""
+        deadline = time.monotonic() + self.lock_timeout
+        pause = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(pause)
+            pause = min(pause * 2, 0.2)
+            found = self.shared.get_many([key, lock_key])
+            if key in found:
+                return found[key][0]
+            if lock_key not in found:
+                # Блокировку сняли, а значения нет - оно не кэшируется.
+                return None
+        return None
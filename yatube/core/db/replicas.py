@@ -0,0 +1,70 @@
+"""Чтение с реплик для страниц, которые ничего не пишут.
+
+Декоратор replica_reads отправляет запросы view на чтение на случайную
+реплику, остальное идёт в основную базу. После POST пользователь
+DATABASE_REPLICA_LAG секунд читает из основной базы (кука), чтобы
+видеть свои изменения, даже если реплика ещё не догнала.
+"""
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def current_replica():
+    """Реплика, с которой читает текущий запрос, или None."""
+    return getattr(_state, 'replica', None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def replica_reads(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            not settings.DATABASE_REPLICAS
+            or request.method not in SAFE_METHODS
+            or PIN_COOKIE in request.COOKIES
+        ):
+            return view(request, *args, **kwargs)
+        _state.replica = random.choice(settings.DATABASE_REPLICAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _state.replica = None
+    return wrapper
+
+
+def pin_primary_middleware(get_response):
+    """Метит кукой клиентов, которые только что писали в базу."""
+    def middleware(request):
+        response = get_response(request)
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=settings.DATABASE_REPLICA_LAG,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+    return middleware
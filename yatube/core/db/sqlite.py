@@ -0,0 +1,95 @@
+"""Настройка SQLite для нескольких одновременных читателей и писателей.
+
+PRAGMA из settings.SQLITE_PRAGMAS применяются к каждому новому
+соединению. В режиме WAL читатели не ждут пишущую транзакцию, а
+busy_timeout заставляет писателей ждать друг друга, а не падать с
+"database is locked". Функция stress сравнивает настройки под нагрузкой.
+"""
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.loadtest import percentile
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполняет PRAGMA на DB-API соединении sqlite3."""
+    cursor = connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def _connect(path, pragmas):
+    # Как и Django, ждём занятую базу до 5 секунд, если pragmas не
+    # задают свой busy_timeout.
+    connection = sqlite3.connect(
+        path, timeout=5, isolation_level=None, check_same_thread=False
+    )
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def _write(connection):
+    connection.execute('BEGIN IMMEDIATE')
+    connection.execute("INSERT INTO items (body) VALUES ('x')")
+    connection.execute('COMMIT')
+
+
+def _read(connection):
+    connection.execute(
+        'SELECT id, body FROM items ORDER BY id DESC LIMIT 10'
+    ).fetchall()
+
+
+def _work(path, pragmas, operation, deadline):
+    """Повторяет operation до deadline: (успехи, ошибки, задержки)."""
+    connection = _connect(path, pragmas)
+    done, errors, timings = 0, 0, []
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            operation(connection)
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+        timings.append(time.perf_counter() - started)
+    connection.close()
+    return done, errors, timings
+
+
+def stress(path, pragmas, seconds=5.0, readers=4, writers=2):
+    """Нагрузка из readers читателей и writers писателей на файл path.
+
+    Писатели добавляют записи по одной в отдельных транзакциях,
+    читатели выбирают последние записи. Возвращает число операций,
+    ошибок блокировки и p99 задержки чтения в миллисекундах.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    setup = _connect(path, pragmas)
+    setup.execute(
+        'CREATE TABLE items (id INTEGER PRIMARY KEY, body TEXT NOT NULL)'
+    )
+    setup.close()
+    deadline = time.monotonic() + seconds
+    operations = [_read] * readers + [_write] * writers
+    with ThreadPoolExecutor(max_workers=len(operations)) as executor:
+        results = list(executor.map(
+            lambda operation: _work(path, pragmas, operation, deadline),
+            operations,
+        ))
+    totals = {'reads': 0, 'writes': 0, 'errors': 0}
+    latencies = []
+    for operation, (done, errors, timings) in zip(operations, results):
+        totals['reads' if operation is _read else 'writes'] += done
+        totals['errors'] += errors
+        if operation is _read:
+            latencies.extend(timings)
+    latencies.sort()
+    return {**totals, 'read_p99': percentile(latencies, 0.99) * 1000}
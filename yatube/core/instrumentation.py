@@ -0,0 +1,349 @@
+"""Замеры запросов: время, SQL, кэш и шаблоны по каждому view.
+
+instrument_middleware оборачивает все соединения с базой
+(connection.execute_wrapper), считает события кэшей CacheMetrics и
+время отрисовки шаблонов (бэкенд DjangoTemplates из этого модуля) и
+отдаёт итог сотрудникам в заголовке Server-Timing. Суммы по view копятся в
+RequestMetrics, складываются со всех процессов через общий кэш и
+отдаются на /metrics/ в текстовом формате Prometheus. Медленные запросы
+выборочно пишутся в лог вместе с планами самых долгих SQL-запросов.
+"""
+import heapq
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from core.cache.tiered import METRICS_PREFIX, CacheMetrics, observers
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы времени ответа, в секундах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+HITS = ('hits', 'l1_hits', 'l2_hits')
+EXPLAIN = {
+    'mysql': 'EXPLAIN ',
+    'postgresql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+# Семейства метрик Prometheus: тип и описание.
+FAMILIES = {
+    'yatube_requests_total': ('counter', 'Ответы по view и классу статуса'),
+    'yatube_request_duration_seconds': ('histogram', 'Время ответа'),
+    'yatube_sql_queries_total': ('counter', 'Запросы к базе'),
+    'yatube_sql_duration_seconds_total': ('counter', 'Время запросов к базе'),
+    'yatube_template_duration_seconds_total': (
+        'counter', 'Время отрисовки шаблонов'
+    ),
+    'yatube_cache_hits_total': ('counter', 'Попадания в кэши'),
+    'yatube_cache_misses_total': ('counter', 'Промахи кэшей'),
+}
+# Время копится целыми микросекундами: общий кэш умеет только incr.
+MICROSECONDS = (
+    'yatube_request_duration_seconds_sum',
+    'yatube_sql_duration_seconds_total',
+    'yatube_template_duration_seconds_total',
+)
+LE = re.compile(r',le="([^"]+)"')
+
+_state = threading.local()
+
+
+def current():
+    """Счётчики текущего запроса или None вне instrument_middleware."""
+    return getattr(_state, 'stats', None)
+
+
+class RequestStats:
+    """Счётчики одного запроса."""
+
+    def __init__(self, keep_queries=0):
+        self.started = time.perf_counter()
+        self.keep_queries = keep_queries
+        self.sql_count = 0
+        self.sql_time = 0.0
+        # Куча самых долгих запросов: (время, номер, alias, sql, params).
+        self.slowest = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    def execute_wrapper(self, alias):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.add_query(
+                    alias, sql, params, time.perf_counter() - started
+                )
+        return wrapper
+
+    def add_query(self, alias, sql, params, duration):
+        self.sql_count += 1
+        self.sql_time += duration
+        if self.keep_queries:
+            item = (duration, self.sql_count, alias, sql, params)
+            if len(self.slowest) < self.keep_queries:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+
+    def render(self, render):
+        """Вложенные шаблоны (include, карточки) не считаются дважды."""
+        self._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render()
+        finally:
+            self._template_depth -= 1
+            if not self._template_depth:
+                self.template_time += time.perf_counter() - started
+
+    def server_timing(self, view, total):
+        return (
+            f'total;dur={total * 1000:.2f}, '
+            f'sql;dur={self.sql_time * 1000:.2f};'
+            f'desc="{self.sql_count} queries", '
+            f'template;dur={self.template_time * 1000:.2f}, '
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses", '
+            f'view;desc="{view}"'
+        )
+
+
+def _observe_cache(metrics, metric, value):
+    stats = current()
+    if stats is None:
+        return
+    if metric in HITS:
+        stats.cache_hits += value
+    elif metric == 'misses':
+        stats.cache_misses += value
+
+
+observers.append(_observe_cache)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        stats = current()
+        if stats is None:
+            return super().render(context, request)
+        return stats.render(lambda: super(Template, self).render(
+            context, request
+        ))
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблоны Django, время отрисовки которых попадает в замеры."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class RequestMetrics(CacheMetrics):
+    """Суммы по view; ключ счётчика - строка серии Prometheus.
+
+    Набор серий неизвестен заранее, поэтому процессы дописывают свои
+    серии в общий список при каждом сбросе счётчиков. Плановый сброс
+    идёт в фоновом потоке, а не в потоке запроса; ошибки кэша только
+    пишутся в лог и ответ не ломают.
+    """
+
+    listed = False
+
+    def __init__(self, name='requests', alias='default', flush_interval=5):
+        super().__init__(name, alias, flush_interval, metric_names=())
+        self._series = set()
+        self._executor = ThreadPoolExecutor(
+            1, thread_name_prefix=f'metrics-{name}'
+        )
+
+    @property
+    def series_key(self):
+        return f'{METRICS_PREFIX}{self.name}:series'
+
+    def record(self, view, status, stats, total):
+        labels = f'view="{view}"'
+        values = Counter({
+            f'yatube_requests_total{{{labels},status="{status // 100}xx"}}':
+                1,
+            f'yatube_request_duration_seconds_count{{{labels}}}': 1,
+            f'yatube_request_duration_seconds_sum{{{labels}}}':
+                round(total * 1e6),
+            f'yatube_sql_queries_total{{{labels}}}': stats.sql_count,
+            f'yatube_sql_duration_seconds_total{{{labels}}}':
+                round(stats.sql_time * 1e6),
+            f'yatube_template_duration_seconds_total{{{labels}}}':
+                round(stats.template_time * 1e6),
+            f'yatube_cache_hits_total{{{labels}}}': stats.cache_hits,
+            f'yatube_cache_misses_total{{{labels}}}': stats.cache_misses,
+        })
+        for le in (*BUCKETS, '+Inf'):
+            values[
+                f'yatube_request_duration_seconds_bucket'
+                f'{{{labels},le="{le}"}}'
+            ] = int(le == '+Inf' or total <= le)
+        try:
+            self._count_many(values)
+        except Exception:
+            logger.exception('Метрики запроса %s не записаны', view)
+
+    def _schedule_flush(self, pending):
+        self._executor.submit(self._flush_in_background, pending)
+
+    def _flush_in_background(self, pending):
+        try:
+            self._flush(pending)
+        finally:
+            # Соединения с базой (кэш db://) у потока свои.
+            connections.close_all()
+
+    def _flush(self, pending):
+        try:
+            super()._flush(pending)
+            # Общий список серий читается, только когда у процесса
+            # появились новые серии. Гонка двух процессов может потерять
+            # серию до их следующей новой серии, но не значения: они
+            # лежат под своими ключами.
+            series = set(pending) - self._series
+            if series:
+                series |= self._series
+                known = self.shared.get(self.series_key) or set()
+                if not known.issuperset(series):
+                    self.shared.set(self.series_key, known | series, None)
+                self._series = series
+        except Exception:
+            logger.exception('Метрики %s не сброшены в общий кэш', self.name)
+
+    def shared_metrics(self):
+        series = (self.shared.get(self.series_key) or set()) | set(
+            self.metrics
+        )
+        keys = {f'{METRICS_PREFIX}{self.name}:{item}': item for item in series}
+        values = self.shared.get_many(list(keys))
+        return {item: values.get(key, 0) for key, item in keys.items()}
+
+
+metrics = RequestMetrics()
+
+
+def _family(series):
+    name = series.split('{', 1)[0]
+    return next((item for item in FAMILIES if name.startswith(item)), name)
+
+
+def _sort_key(series):
+    """Серии группируются по семействам, корзины идут по возрастанию."""
+    family = _family(series)
+    order = list(FAMILIES).index(family) if family in FAMILIES else 0
+    le = LE.search(series)
+    return order, family, LE.sub('', series), float(le.group(1)) if le else 0
+
+
+def prometheus(values):
+    """Счётчики {серия: значение} в текстовом формате Prometheus."""
+    lines, previous = [], None
+    for series in sorted(values, key=_sort_key):
+        family = _family(series)
+        if family != previous:
+            kind, description = FAMILIES.get(family, ('untyped', family))
+            lines += [
+                f'# HELP {family} {description}',
+                f'# TYPE {family} {kind}',
+            ]
+            previous = family
+        value = values[series]
+        if series.split('{', 1)[0] in MICROSECONDS:
+            value = value / 1e6
+        lines.append(f'{series} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def explain(alias, sql, params):
+    """План запроса SELECT или None, если его не получить."""
+    connection = connections[alias]
+    prefix = EXPLAIN.get(connection.vendor)
+    if prefix is None or not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(
+                ' '.join(map(str, row)) for row in cursor.fetchall()
+            )
+    except DatabaseError:
+        return None
+
+
+def log_slow(request, view, stats, total):
+    lines = [
+        f'Медленный запрос {request.method} {request.path} ({view}): '
+        f'{total * 1000:.1f} мс, SQL {stats.sql_count} за '
+        f'{stats.sql_time * 1000:.1f} мс, шаблоны '
+        f'{stats.template_time * 1000:.1f} мс'
+    ]
+    for duration, _, alias, sql, params in sorted(
+        stats.slowest, reverse=True
+    ):
+        lines.append(f'{duration * 1000:.1f} мс [{alias}] {sql}')
+        plan = explain(alias, sql, params)
+        if plan:
+            lines.append(plan)
+    logger.warning('\n'.join(lines))
+
+
+def server_timing_allowed(request):
+    """Server-Timing раскрывает устройство сайта: только для своих."""
+    if not settings.INSTRUMENTATION_SERVER_TIMING:
+        return False
+    user = getattr(request, 'user', None)
+    return settings.DEBUG or bool(user and user.is_staff)
+
+
+def instrument_middleware(get_response):
+    """Замеряет запрос; должен стоять первым в MIDDLEWARE."""
+    def middleware(request):
+        if not settings.INSTRUMENTATION:
+            return get_response(request)
+        stats = _state.stats = RequestStats(
+            settings.INSTRUMENTATION_SLOW_QUERIES
+        )
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(
+                        stats.execute_wrapper(alias)
+                    ))
+                response = get_response(request)
+        finally:
+            _state.stats = None
+        total = time.perf_counter() - stats.started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.record(view, response.status_code, stats, total)
+        if server_timing_allowed(request):
+            response['Server-Timing'] = stats.server_timing(view, total)
+        if (
+            total * 1000 >= settings.INSTRUMENTATION_SLOW_REQUEST
+            and random.random() < settings.INSTRUMENTATION_SLOW_SAMPLE
+        ):
+            log_slow(request, view, stats, total)
+        return response
+    return middleware
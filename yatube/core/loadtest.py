@@ -0,0 +1,66 @@
+"""Простой нагрузочный тест: пропускная способность и задержки по URL.
+
+Нужен, чтобы сравнить WSGI- и ASGI-запуск на одном железе: один и тот
+же прогон запускается против обоих серверов.
+"""
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу; values должны быть отсортированы."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+
+def _request(url, timeout, client_delay):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            if not client_delay:
+                response.read()
+            # Медленный клиент читает ответ по кусочку с паузами.
+            while client_delay and response.read(4096):
+                time.sleep(client_delay)
+        ok = True
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def run(url, requests, concurrency, timeout=30, client_delay=0):
+    """Отправляет requests запросов в concurrency потоков.
+
+    Возвращает словарь со счётчиками, запросами в секунду и задержками
+    p50/p99 в миллисекундах.
+    """
+    lock = threading.Lock()
+    latencies, errors = [], 0
+
+    def worker(_):
+        nonlocal errors
+        ok, latency = _request(url, timeout, client_delay)
+        with lock:
+            if ok:
+                latencies.append(latency)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'url': url,
+        'requests': requests,
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.5) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+    }
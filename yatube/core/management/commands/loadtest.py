@@ -0,0 +1,37 @@
+from core import loadtest
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенного сервера: запросы в секунду и '
+        'задержки p50/p99 по каждому адресу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Полные адреса страниц.')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument(
+            '--client-delay',
+            type=float,
+            default=0,
+            help='Пауза между кусками ответа: имитация медленных клиентов.',
+        )
+
+    def handle(self, *args, **options):
+        for url in options['urls']:
+            result = loadtest.run(
+                url,
+                options['requests'],
+                options['concurrency'],
+                timeout=options['timeout'],
+                client_delay=options['client_delay'],
+            )
+            self.stdout.write(
+                '{url}: {rps:.1f} запр/с, p50 {p50:.1f} мс, '
+                'p99 {p99:.1f} мс, ошибок {errors} из {requests}'.format(
+                    **result
+                )
+            )
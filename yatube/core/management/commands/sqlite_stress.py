@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+from core.db import sqlite
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузка на временную базу SQLite одновременными чтениями и '
+        'записями: настройки по умолчанию против SQLITE_PRAGMAS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        profiles = (
+            ('по умолчанию', {}),
+            ('SQLITE_PRAGMAS', settings.SQLITE_PRAGMAS),
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for title, pragmas in profiles:
+                result = sqlite.stress(
+                    os.path.join(directory, 'stress.sqlite3'),
+                    pragmas,
+                    seconds=options['seconds'],
+                    readers=options['readers'],
+                    writers=options['writers'],
+                )
+                self.stdout.write(
+                    '{title}: чтений {reads}, записей {writes}, ошибок '
+                    '{errors}, p99 чтения {read_p99:.1f} мс'.format(
+                        title=title, **result
+                    )
+                )
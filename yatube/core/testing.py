@@ -0,0 +1,13 @@
+"""Помощники для тестов."""
+from django.db import connections
+
+
+def run_on_commit(using='default'):
+    """Выполняет отложенные transaction.on_commit.
+
+    TestCase никогда не коммитит, поэтому сам Django их не вызовет.
+    """
+    connection = connections[using]
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
@@ -1,6 +1,34 @@
+import asyncio
+import fnmatch
+import http.server
+import socketserver
+import sqlite3
+import tempfile
+import threading
+import time
 from http import HTTPStatus
 
-from django.test import TestCase
+from core import instrumentation, loadtest
+from core.asgi import WsgiBridge
+from core.cache.config import parse_cache_url
+from core.cache.redis import INCR_SCRIPT, RedisCache
+from core.cache.tiered import TwoTierCache
+from core.db.config import parse_database_url, parse_replica_urls
+from core.db import sqlite
+from core.db.replicas import (PIN_COOKIE, ReplicaRouter,
+                              pin_primary_middleware, replica_reads)
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +36,601 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Минимальный RESP-сервер: подмножество команд Redis для тестов."""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, str):
+            return b'+%s\r\n' % value.encode()
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(map(self.reply, value))
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        self.server.connections += 1
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].decode().upper()
+            try:
+                result = getattr(self.server, f'cmd_{name}')(*args[1:])
+            except ValueError as error:
+                self.wfile.write(b'-ERR %s\r\n' % str(error).encode())
+            else:
+                self.wfile.write(self.reply(result))
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.connections = 0
+        self.data = {}
+        self.expires = {}
+
+    def alive(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def cmd_SELECT(self, db):
+        return 'OK'
+
+    def cmd_GET(self, key):
+        return self.data[key] if self.alive(key) else None
+
+    def cmd_MGET(self, *keys):
+        return [self.cmd_GET(key) for key in keys]
+
+    def cmd_SET(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self.alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            milliseconds = int(options[options.index(b'PX') + 1])
+            self.expires[key] = time.monotonic() + milliseconds / 1000
+        return 'OK'
+
+    def cmd_DEL(self, *keys):
+        removed = [key for key in keys if self.alive(key)]
+        for key in removed:
+            del self.data[key]
+        return len(removed)
+
+    def cmd_EXISTS(self, key):
+        return int(self.alive(key))
+
+    def cmd_INCRBY(self, key, delta):
+        if not self.cmd_GET(key).lstrip(b'-').isdigit():
+            raise ValueError('value is not an integer')
+        self.data[key] = b'%d' % (int(self.data[key]) + int(delta))
+        return int(self.data[key])
+
+    def cmd_EVAL(self, script, numkeys, key, delta):
+        if script.decode() != INCR_SCRIPT:
+            raise ValueError('unknown script')
+        return self.cmd_INCRBY(key, delta) if self.alive(key) else None
+
+    def cmd_PEXPIRE(self, key, milliseconds):
+        if not self.alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(milliseconds) / 1000
+        return 1
+
+    def cmd_PERSIST(self, key):
+        return int(self.expires.pop(key, None) is not None)
+
+    def cmd_SCAN(self, cursor, _, pattern, *options):
+        keys = [
+            key for key in list(self.data)
+            if self.alive(key) and fnmatch.fnmatchcase(key, pattern)
+        ]
+        return [b'0', keys]
+
+    def cmd_FLUSHDB(self):
+        self.data.clear()
+        self.expires.clear()
+        return 'OK'
+
+
+class RedisCacheTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRedisServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.location = '127.0.0.1:%d' % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def make_cache(self, prefix='test', **options):
+        return RedisCache(self.location, {
+            'KEY_PREFIX': prefix,
+            'OPTIONS': {'MAX_CONNECTIONS': 2, **options},
+        })
+
+    def setUp(self):
+        self.server.cmd_FLUSHDB()
+        self.cache = self.make_cache()
+
+    def test_values_round_trip(self):
+        values = {'int': 42, 'str': 'строка', 'dict': {'a': [1, 2]}, 'b': True}
+        self.cache.set_many(values)
+        self.assertEqual(self.cache.get_many(list(values) + ['nope']), values)
+        self.assertEqual(self.cache.get('nope', 'default'), 'default')
+        self.assertIs(self.cache.get('b'), True)
+
+    def test_incr_is_server_side(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        self.assertEqual(self.make_cache().get('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_add_and_delete(self):
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+        self.assertTrue(self.cache.delete('key'))
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_timeouts(self):
+        self.cache.set('short', 'value', timeout=0.05)
+        self.cache.set('gone', 'value', timeout=0)
+        self.cache.set('forever', 'value', timeout=None)
+        self.assertEqual(self.cache.get('short'), 'value')
+        self.assertIsNone(self.cache.get('gone'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_clear_keeps_other_namespaces(self):
+        other = self.make_cache(prefix='other')
+        self.cache.set('key', 1)
+        other.set('key', 2)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(other.get('key'), 2)
+
+    def test_connections_are_pooled(self):
+        before = self.server.connections
+        for i in range(20):
+            self.cache.set(f'key{i}', i)
+            self.make_cache().get(f'key{i}')
+        self.assertLessEqual(self.server.connections - before, 1)
+
+
+class ParseCacheUrlTests(SimpleTestCase):
+    def test_backends(self):
+        cases = {
+            'redis://:secret@cache:6380/2?max_connections=20': {
+                'BACKEND': 'core.cache.redis.RedisCache',
+                'KEY_PREFIX': 'site',
+                'LOCATION': 'cache:6380',
+                'OPTIONS': {
+                    'DB': '2', 'MAX_CONNECTIONS': '20', 'PASSWORD': 'secret'
+                },
+            },
+            'memcached://one:11211,two:11211?timeout=60': {
+                'BACKEND': (
+                    'django.core.cache.backends.memcached.MemcachedCache'
+                ),
+                'KEY_PREFIX': 'site',
+                'LOCATION': ['one:11211', 'two:11211'],
+                'TIMEOUT': 60,
+            },
+            'file:///var/tmp/yatube': {
+                'BACKEND': (
+                    'django.core.cache.backends.filebased.FileBasedCache'
+                ),
+                'KEY_PREFIX': 'site',
+                'LOCATION': '/var/tmp/yatube',
+            },
+            'db://cache_table': {
+                'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                'KEY_PREFIX': 'site',
+                'LOCATION': 'cache_table',
+            },
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(parse_cache_url(url, 'site'), expected)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ImproperlyConfigured):
+            parse_cache_url('mongodb://localhost')
+
+
+class ParseDatabaseUrlTests(SimpleTestCase):
+    def test_backends(self):
+        cases = {
+            'sqlite:///db.sqlite3': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'CONN_MAX_AGE': 0,
+                'NAME': '/srv/db.sqlite3',
+            },
+            'postgres://user:p%40ss@db:5433/yatube'
+            '?conn_max_age=600&statement_timeout=5000&sslmode=require': {
+                'ENGINE': 'django.db.backends.postgresql',
+                'CONN_MAX_AGE': 600,
+                'NAME': 'yatube',
+                'USER': 'user',
+                'PASSWORD': 'p@ss',
+                'HOST': 'db',
+                'PORT': '5433',
+                'OPTIONS': {
+                    'options': '-c statement_timeout=5000',
+                    'sslmode': 'require',
+                },
+            },
+            'postgres://user@pgbouncer/yatube?pooler=pgbouncer': {
+                'ENGINE': 'django.db.backends.postgresql',
+                'CONN_MAX_AGE': 60,
+                'DISABLE_SERVER_SIDE_CURSORS': True,
+                'NAME': 'yatube',
+                'USER': 'user',
+                'PASSWORD': '',
+                'HOST': 'pgbouncer',
+                'PORT': '',
+            },
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(parse_database_url(url, '/srv'), expected)
+
+    def test_invalid_urls(self):
+        for url in (
+            'mysql://db/yatube',
+            'postgres://db/yatube?pooler=1&statement_timeout=10',
+        ):
+            with self.subTest(url=url):
+                with self.assertRaises(ImproperlyConfigured):
+                    parse_database_url(url)
+
+    def test_replicas_mirror_default_in_tests(self):
+        replicas = parse_replica_urls('postgres://a/y, postgres://b/y')
+        self.assertEqual(list(replicas), ['replica_1', 'replica_2'])
+        self.assertEqual(replicas['replica_2']['HOST'], 'b')
+        self.assertEqual(replicas['replica_1']['TEST'], {'MIRROR': 'default'})
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_database(self, request):
+        @replica_reads
+        def view(request):
+            return HttpResponse(self.router.db_for_read(User) or 'default')
+        return view(request).content.decode()
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(
+            self.read_database(self.factory.get('/')), 'replica_1'
+        )
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'posts'))
+
+    def test_writers_are_pinned_to_primary(self):
+        self.assertEqual(
+            self.read_database(self.factory.post('/')), 'default'
+        )
+        middleware = pin_primary_middleware(lambda request: HttpResponse())
+        response = middleware(self.factory.post('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.read_database(request), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_is_primary(self):
+        self.assertEqual(self.read_database(self.factory.get('/')), 'default')
+        middleware = pin_primary_middleware(lambda request: HttpResponse())
+        response = middleware(self.factory.post('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class SqliteTuningTests(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/test.sqlite3'
+
+    def test_pragmas_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_readers_are_not_blocked_by_writer(self):
+        for pragmas, blocked in (({}, True), (settings.SQLITE_PRAGMAS, False)):
+            with self.subTest(pragmas=pragmas):
+                sqlite.stress(self.path, pragmas, seconds=0)
+                writer = sqlite3.connect(self.path, isolation_level=None)
+                sqlite.apply_pragmas(writer, pragmas)
+                writer.execute('BEGIN EXCLUSIVE')
+                writer.execute("INSERT INTO items (body) VALUES ('x')")
+                reader = sqlite3.connect(self.path, timeout=0)
+                try:
+                    reader.execute('SELECT COUNT(*) FROM items').fetchone()
+                except sqlite3.OperationalError:
+                    self.assertTrue(blocked)
+                else:
+                    self.assertFalse(blocked)
+                finally:
+                    reader.close()
+                    writer.execute('ROLLBACK')
+                    writer.close()
+
+    def test_stress_without_lock_errors(self):
+        result = sqlite.stress(
+            self.path, settings.SQLITE_PRAGMAS, seconds=0.3
+        )
+        self.assertEqual(result['errors'], 0)
+        self.assertGreater(result['reads'], 0)
+        self.assertGreater(result['writes'], 0)
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tiers = TwoTierCache('test', local_timeout=60)
+
+    def test_local_tier_serves_repeated_reads(self):
+        self.assertEqual(self.tiers.get_or_set('key', lambda: 'v', 60), 'v')
+        cache.clear()
+        self.assertEqual(self.tiers.get_or_set('key', lambda: 'new', 60), 'v')
+        self.assertEqual(self.tiers.metrics['l1_hits'], 1)
+
+    def test_shared_tier_fills_other_processes(self):
+        self.tiers.get_or_set('key', lambda: 'v', 60)
+        other = TwoTierCache('test')
+        self.assertEqual(other.get_or_set('key', lambda: 'new', 60), 'v')
+        self.assertEqual(other.metrics['l2_hits'], 1)
+
+    def test_none_is_not_cached(self):
+        self.assertIsNone(self.tiers.get_or_set('key', lambda: None, 60))
+        self.assertEqual(self.tiers.get_or_set('key', lambda: 'v', 60), 'v')
+
+    def test_only_one_concurrent_rebuild(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'v'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                TwoTierCache('test').get_or_set('key', compute, 60)
+            )) for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['v'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_early_rebuild_near_expiry(self):
+        cache.set('key', ('old', 1000, time.time() + 1), 60)
+        value = self.tiers.get_or_set('key', lambda: 'new', 60)
+        self.assertEqual(value, 'new')
+        self.assertEqual(self.tiers.metrics['early_rebuilds'], 1)
+
+    def test_metrics_endpoint_for_staff(self):
+        self.tiers.get_or_set('key', lambda: 'v', 60)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('cache_metrics'))
+        self.assertEqual(response.json()['test']['total']['misses'], 1)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:index')
+
+    def test_server_timing_header(self):
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        with CaptureQueriesContext(connection) as queries:
+            timing = self.client.get(self.url)['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn('view;desc="posts:index"', timing)
+        self.assertRegex(timing, r'template;dur=(?!0\.00)')
+        timing = self.client.get(self.url)['Server-Timing']
+        # Из кэша: остаются только запросы сессии и пользователя.
+        self.assertIn('desc="2 queries"', timing)
+        self.assertIn('cache;desc="1 hits, 0 misses"', timing)
+
+    def test_server_timing_hidden_from_visitors(self):
+        self.assertNotIn('Server-Timing', self.client.get(self.url))
+        with self.settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get(self.url))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_needs_token_or_staff(self):
+        self.client.get(self.url)
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertContains(
+            response, 'yatube_requests_total{view="posts:index",status="2xx"}'
+        )
+        self.assertContains(
+            response, '# TYPE yatube_request_duration_seconds histogram'
+        )
+
+    def test_metrics_are_summed_across_processes(self):
+        stats = instrumentation.RequestStats()
+        stats.add_query('default', 'SELECT 1', (), 0.002)
+        first = instrumentation.RequestMetrics('test-requests')
+        first.record('posts:index', 200, stats, 0.03)
+        first.flush_metrics()
+        other = instrumentation.RequestMetrics('test-requests')
+        other.record('posts:index', 200, stats, 0.3)
+        other.flush_metrics()
+        text = instrumentation.prometheus(first.shared_metrics())
+        lines = [
+            line for line in text.splitlines()
+            if line.startswith('yatube_request_duration_seconds_bucket')
+        ]
+        self.assertEqual(lines[3:6], [
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="0.05"} 1',
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="0.1"} 1',
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="0.25"} 1',
+        ])
+        self.assertEqual(lines[-1].split()[-1], '2')
+        self.assertIn(
+            'yatube_sql_duration_seconds_total{view="posts:index"} 0.004',
+            text,
+        )
+
+    def test_metrics_flush_in_background_and_log_errors(self):
+        class BrokenMetrics(instrumentation.RequestMetrics):
+            threads = []
+
+            @property
+            def shared(self):
+                self.threads.append(threading.current_thread())
+                raise ConnectionError('кэш недоступен')
+
+        metrics = BrokenMetrics('test-broken', flush_interval=0)
+        stats = instrumentation.RequestStats()
+        with self.assertLogs('core.instrumentation', 'ERROR') as logs:
+            metrics.record('posts:index', 200, stats, 0.01)
+            metrics._executor.shutdown()
+        self.assertIn('не сброшены', logs.output[0])
+        self.assertTrue(metrics.threads)
+        self.assertNotIn(threading.current_thread(), metrics.threads)
+
+    @override_settings(
+        INSTRUMENTATION_SLOW_REQUEST=0, INSTRUMENTATION_SLOW_SAMPLE=1
+    )
+    def test_slow_requests_are_logged_with_plans(self):
+        user = User.objects.create_user(username='Author')
+        with self.assertLogs('core.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('posts:profile', args=(user.username,)))
+        self.assertIn('(posts:profile)', logs.output[0])
+        self.assertIn('"auth_user"."username" = %s', logs.output[0])
+        self.assertTrue(instrumentation.explain(
+            'default', 'SELECT id FROM auth_user WHERE id = %s', (1,)
+        ))
+        self.assertIsNone(instrumentation.explain(
+            'default', 'DELETE FROM auth_user WHERE id = %s', (1,)
+        ))
+
+
+def echo_application(environ, start_response):
+    """WSGI-приложение, которое возвращает данные запроса."""
+    start_response('201 Created', [('X-Path', environ['PATH_INFO'])])
+    return [
+        environ['REQUEST_METHOD'].encode(),
+        b' ', environ['QUERY_STRING'].encode(),
+        b' ', environ.get('HTTP_X_TAG', '').encode(),
+        b' ', environ['wsgi.input'].read(),
+    ]
+
+
+class WsgiBridgeTests(SimpleTestCase):
+    def call(self, scope, messages):
+        bridge = WsgiBridge(echo_application, threads=2)
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(bridge(scope, receive, send))
+        return sent
+
+    def test_request_is_passed_to_wsgi(self):
+        sent = self.call(
+            {
+                'type': 'http',
+                'method': 'POST',
+                'path': '/posts/',
+                'query_string': b'page=2',
+                'headers': [(b'x-tag', b'a'), (b'x-tag', b'b')],
+            },
+            [
+                {'type': 'http.request', 'body': b'he', 'more_body': True},
+                {'type': 'http.request', 'body': b'llo'},
+            ],
+        )
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'x-path', b'/posts/'), sent[0]['headers'])
+        self.assertEqual(sent[1]['body'], b'POST page=2 a,b hello')
+
+    def test_disconnected_client_gets_nothing(self):
+        sent = self.call(
+            {'type': 'http', 'method': 'GET', 'path': '/'},
+            [{'type': 'http.disconnect'}],
+        )
+        self.assertEqual(sent, [])
+
+
+class LoadTestTests(SimpleTestCase):
+    def test_reports_throughput_and_latency(self):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200 if self.path == '/' else 404)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_port}/'
+        result = loadtest.run(url, requests=20, concurrency=4)
+        self.assertEqual(result['errors'], 0)
+        self.assertGreater(result['rps'], 0)
+        self.assertGreaterEqual(result['p99'], result['p50'])
+        self.assertEqual(
+            loadtest.run(url + 'missing', 3, 1)['errors'], 3
+        )
+        self.assertEqual(loadtest.percentile([1, 2, 3, 4], 0.99), 4)
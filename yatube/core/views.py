@@ -1,3 +1,11 @@
+import hmac
+
+from core import instrumentation
+from core.cache.tiered import instances
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 
 
@@ -15,3 +23,37 @@ def permission_denied(request, exception):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+@staff_member_required
+def cache_metrics(request):
+    """Попадания и промахи двухуровневых кэшей: процесса и суммарные."""
+    metrics = {}
+    for name, tiers in instances.items():
+        tiers.flush_metrics()
+        metrics[name] = {
+            'process': dict(tiers.metrics),
+            'total': tiers.shared_metrics(),
+        }
+    return JsonResponse(metrics)
+
+
+def metrics(request):
+    """Счётчики запросов по view в формате Prometheus, со всех процессов.
+
+    Доступны сотрудникам и по заголовку Authorization: Bearer
+    METRICS_TOKEN - для сборщика метрик.
+    """
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(
+        ' '
+    )
+    allowed = bool(settings.METRICS_TOKEN) and scheme == 'Bearer' and (
+        hmac.compare_digest(token, settings.METRICS_TOKEN)
+    )
+    if not allowed and not request.user.is_staff:
+        raise PermissionDenied
+    instrumentation.metrics.flush_metrics()
+    return HttpResponse(
+        instrumentation.prometheus(instrumentation.metrics.shared_metrics()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,34 @@
+from django.contrib import admin
+
+from . import worker
+from .models import DeadJob, Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'name',
+        'attempts',
+        'run_at',
+        'created',
+    )
+    list_filter = ('name',)
+    readonly_fields = ('last_error',)
+
+
+class DeadJobAdmin(admin.ModelAdmin):
+    actions = ('requeue',)
+    list_display = (
+        'name',
+        'attempts',
+        'failed',
+    )
+    list_filter = ('name',)
+
+    def requeue(self, request, queryset):
+        count = worker.requeue(queryset)
+        self.message_user(request, f'Поставлено в очередь: {count}')
+    requeue.short_description = 'Поставить в очередь заново'
+
+
+admin.site.register(Job, JobAdmin)
+admin.site.register(DeadJob, DeadJobAdmin)
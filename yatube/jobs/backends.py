@@ -0,0 +1,47 @@
+"""Бэкенды очереди: куда попадает задача при вызове delay()."""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import queue, worker
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseBackend:
+    """Задачи хранятся в таблице Job и выполняются командой run_jobs.
+
+    Строка задачи пишется в той же транзакции, что и изменение, которое
+    её вызвало: откат транзакции отменяет и задачу.
+    """
+
+    def enqueue(self, name, args, delay=0):
+        job = Job.objects.create(
+            name=name,
+            args=args,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+        if settings.JOBS_RUN_INLINE:
+            transaction.on_commit(worker.run_pending)
+        return job
+
+
+class ImmediateBackend:
+    """Задача выполняется сразу после коммита в том же процессе.
+
+    Без повторов и без таблицы: для разработки без запущенного воркера.
+    """
+
+    def enqueue(self, name, args, delay=0):
+        def run():
+            try:
+                queue.get(name)(*json.loads(args))
+            except Exception:
+                logger.exception('Задача %s не выполнена', name)
+
+        transaction.on_commit(run)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from jobs import worker
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать подошедшие задачи и выйти.',
+        )
+        parser.add_argument('--sleep', type=float, default=1.0)
+        parser.add_argument('--batch', type=int, default=100)
+
+    def handle(self, *args, **options):
+        if options['once']:
+            done = worker.run_pending(options['batch'])
+            self.stdout.write(f'Выполнено задач: {done}')
+            return
+        try:
+            worker.run(options['sleep'], options['batch'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeadJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('args', models.TextField(verbose_name='Аргументы')),
+                ('attempts', models.PositiveIntegerField(verbose_name='Попыток')),
+                ('created', models.DateTimeField(verbose_name='Дата постановки')),
+                ('error', models.TextField(verbose_name='Ошибка')),
+                ('failed', models.DateTimeField(auto_now_add=True, verbose_name='Дата отказа')),
+                ('name', models.CharField(max_length=200, verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Неудавшаяся задача',
+                'verbose_name_plural': 'Неудавшиеся задачи',
+            },
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('args', models.TextField(default='[]', verbose_name='Аргументы')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('name', models.CharField(max_length=200, verbose_name='Задача')),
+                ('run_at', models.DateTimeField(verbose_name='Выполнить не раньше')),
+            ],
+            options={
+                'verbose_name': 'Задача',
+                'verbose_name_plural': 'Задачи',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['run_at', 'id'], name='jobs_job_run_at_c7f683_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """Задача в очереди; выполняет её команда run_jobs.
+
+    Взятая в работу задача не помечается отдельно: её run_at сдвигается
+    на срок аренды, и если воркер упал, задачу возьмёт другой.
+    """
+
+    args = models.TextField(
+        default='[]',
+        verbose_name='Аргументы',
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата постановки',
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+    )
+    name = models.CharField(
+        max_length=200,
+        verbose_name='Задача',
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Выполнить не раньше',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_at', 'id']),
+        ]
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class DeadJob(models.Model):
+    """Задача, которая исчерпала попытки; её можно поставить заново."""
+
+    args = models.TextField(
+        verbose_name='Аргументы',
+    )
+    attempts = models.PositiveIntegerField(
+        verbose_name='Попыток',
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата постановки',
+    )
+    error = models.TextField(
+        verbose_name='Ошибка',
+    )
+    failed = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата отказа',
+    )
+    name = models.CharField(
+        max_length=200,
+        verbose_name='Задача',
+    )
+
+    class Meta:
+        verbose_name = 'Неудавшаяся задача'
+        verbose_name_plural = 'Неудавшиеся задачи'
+
+    def __str__(self) -> str:
+        return self.name
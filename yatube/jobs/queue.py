@@ -0,0 +1,54 @@
+"""Очередь фоновых задач для побочных эффектов записи.
+
+Задача - функция, помеченная декоратором task; в очередь она ставится
+вызовом func.delay(*args) с аргументами, которые переводятся в JSON.
+Куда попадает задача, решает бэкенд из JOBS_BACKEND.
+"""
+import json
+from functools import lru_cache
+from importlib import import_module
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+registry = {}
+
+
+def task(func=None, max_attempts=None):
+    """Регистрирует функцию как задачу и добавляет ей метод delay."""
+    def decorator(func):
+        name = f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        func.delay = lambda *args, **options: enqueue(name, args, **options)
+        registry[name] = func
+        return func
+    return decorator(func) if func is not None else decorator
+
+
+def get(name):
+    """Функция задачи по имени; модуль импортируется, если ещё не был."""
+    if name not in registry:
+        try:
+            import_module(name.rsplit('.', 1)[0])
+        except ImportError:
+            pass
+    try:
+        return registry[name]
+    except KeyError:
+        raise LookupError(f'Задача {name} не зарегистрирована')
+
+
+@lru_cache(maxsize=None)
+def _backend(path):
+    return import_string(path)()
+
+
+def backend():
+    return _backend(settings.JOBS_BACKEND)
+
+
+def enqueue(name, args=(), delay=0):
+    """Ставит задачу name в очередь; delay - отсрочка в секундах."""
+    get(name)
+    args = json.dumps(list(args), ensure_ascii=False)
+    return backend().enqueue(name, args, delay)
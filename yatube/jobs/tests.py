@@ -0,0 +1,80 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import worker
+from .models import DeadJob, Job
+from .queue import task
+
+calls = []
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def fail():
+    raise ValueError('Сбой')
+
+
+@override_settings(
+    JOBS_RETRY_DELAY=10, JOBS_RETRY_MAX_DELAY=30, JOBS_RUN_INLINE=False
+)
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def make_due(self):
+        Job.objects.update(run_at=timezone.now())
+
+    def test_job_waits_for_worker(self):
+        remember.delay('первый')
+        remember.delay('второй', delay=60)
+        self.assertEqual(calls, [])
+        out = StringIO()
+        call_command('run_jobs', '--once', stdout=out)
+        self.assertIn('Выполнено задач: 1', out.getvalue())
+        self.assertEqual(calls, ['первый'])
+        self.assertEqual(Job.objects.get().args, '["второй"]')
+
+    def test_failures_are_retried_then_buried(self):
+        fail.delay()
+        started = timezone.now()
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            worker.run_pending()
+        job = Job.objects.get()
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('Сбой', job.last_error)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=10))
+        self.make_due()
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            worker.run_pending()
+        self.assertFalse(Job.objects.exists())
+        dead = DeadJob.objects.get()
+        self.assertEqual((dead.name, dead.attempts), ('jobs.tests.fail', 2))
+        self.assertEqual(worker.requeue(DeadJob.objects.all()), 1)
+        self.assertEqual(Job.objects.get().attempts, 0)
+
+    def test_claimed_job_is_leased(self):
+        remember.delay('x')
+        self.assertEqual(len(worker.claim(10)), 1)
+        self.assertEqual(worker.claim(10), [])
+        # Воркер упал: после аренды задачу берёт другой.
+        self.make_due()
+        self.assertEqual(worker.claim(10)[0].attempts, 2)
+
+    def test_unknown_job_goes_to_dead_letter(self):
+        Job.objects.create(name='jobs.tests.missing', run_at=timezone.now())
+        worker.run_pending()
+        self.assertIn('не зарегистрирована', DeadJob.objects.get().error)
+
+    def test_backoff_doubles_up_to_limit(self):
+        self.assertEqual(
+            [worker.backoff(attempt) for attempt in range(1, 5)],
+            [10, 20, 30, 30],
+        )
@@ -0,0 +1,127 @@
+"""Выполнение задач из таблицы Job: аренда, повторы и отказ."""
+import json
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import queue
+from .models import DeadJob, Job
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+def backoff(attempts):
+    """Пауза перед повтором: удваивается с каждой попыткой до предела."""
+    return min(
+        settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_MAX_DELAY,
+    )
+
+
+def claim(limit):
+    """Берёт в работу до limit подошедших задач.
+
+    Задача достаётся тому, чей UPDATE застал её run_at прежним, поэтому
+    несколько воркеров не возьмут одну задачу ни на какой базе.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.JOBS_LEASE)
+    due = Job.objects.filter(run_at__lte=now).order_by('run_at', 'id')
+    claimed = [
+        pk for pk, run_at in due.values_list('pk', 'run_at')[:limit]
+        if Job.objects.filter(pk=pk, run_at=run_at).update(
+            run_at=lease, attempts=F('attempts') + 1
+        )
+    ]
+    return list(Job.objects.filter(pk__in=claimed).order_by('id'))
+
+
+def _bury(job, error):
+    with transaction.atomic():
+        DeadJob.objects.create(
+            args=job.args,
+            attempts=job.attempts,
+            created=job.created,
+            error=error,
+            name=job.name,
+        )
+        Job.objects.filter(pk=job.pk).delete()
+
+
+def execute(job):
+    """Выполняет взятую задачу; True, если она прошла успешно."""
+    try:
+        func = queue.get(job.name)
+    except LookupError as error:
+        _bury(job, str(error))
+        return False
+    try:
+        with transaction.atomic():
+            func(*json.loads(job.args))
+    except Exception:
+        logger.exception('Задача %s (попытка %s)', job.name, job.attempts)
+        error = traceback.format_exc()
+        if job.attempts >= func.max_attempts:
+            _bury(job, error)
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                last_error=error,
+                run_at=timezone.now() + timedelta(
+                    seconds=backoff(job.attempts)
+                ),
+            )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(batch=100):
+    """Выполняет все подошедшие задачи, возвращает их число.
+
+    Задачи, поставленные во время разбора, разбирает тот же цикл, а не
+    вложенный вызов.
+    """
+    if getattr(_state, 'running', False):
+        return 0
+    _state.running = True
+    done = 0
+    try:
+        while True:
+            jobs = claim(batch)
+            if not jobs:
+                return done
+            for job in jobs:
+                execute(job)
+            done += len(jobs)
+    finally:
+        _state.running = False
+
+
+def run(sleep=1.0, batch=100):
+    """Цикл воркера: разбирает очередь, пока его не остановят."""
+    while True:
+        close_old_connections()
+        if not run_pending(batch):
+            time.sleep(sleep)
+
+
+def requeue(dead_jobs):
+    """Ставит неудавшиеся задачи в очередь заново с нуля попыток."""
+    count = 0
+    for dead in dead_jobs:
+        with transaction.atomic():
+            Job.objects.create(
+                args=dead.args, name=dead.name, run_at=timezone.now()
+            )
+            dead.delete()
+        count += 1
+    return count
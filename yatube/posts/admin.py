@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Group, Post
+from .search import matching_post_ids, supported
 
 
 class CommentAdmin(admin.ModelAdmin):
@@ -40,6 +41,14 @@ class PostAdmin(admin.ModelAdmin):
     )
     search_fields = ('text',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через полнотекстовый индекс, а не LIKE.
+        if not search_term or not supported():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(pk__in=matching_post_ids(search_term)), False
+
 
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Group, GroupAdmin)
@@ -0,0 +1,339 @@
+"""Бенчмарк страниц posts: число запросов, задержки и память.
+
+Данные заполняются пачками без сигналов, с перекосом как в жизни: у
+немногих авторов большинство постов и подписчиков, у немногих постов -
+большинство комментариев. Затем каждая страница из posts/urls.py
+запрашивается с холодным и тёплым кэшем; результаты сравниваются с
+сохранённой базовой линией.
+"""
+import json
+import random
+import re
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import accumulate
+
+from core.loadtest import percentile
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from faker import Faker
+
+from . import search, timeline, urls
+from .counters import recount
+from .models import Comment, Follow, Group, Post, User
+from .utils import comment_page
+
+BATCH_SIZE: int = 1000
+READER = 'bench_reader'
+# Разница меньше этих величин считается шумом, а не регрессией.
+MIN_TIME_DELTA: float = 5.0
+MIN_MEMORY_DELTA: int = 256
+
+Endpoint = namedtuple(
+    'Endpoint', 'method args data auth mutates',
+    defaults=((), None, False, False),
+)
+
+
+def _zipf(size, s=1.1):
+    """Накопленные веса для random.choices: закон Ципфа по номеру."""
+    return list(accumulate(1 / (rank + 1) ** s for rank in range(size)))
+
+
+def _bulk(model, objects, **options):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch, **options)
+            batch = []
+    model.objects.bulk_create(batch, **options)
+
+
+def _fill_comment_paths():
+    # bulk_create не вызывает Comment.save(): все комментарии корневые.
+    ids = Comment.objects.filter(path='').values_list('pk', flat=True)
+    while True:
+        batch = [
+            Comment(pk=pk, path=Comment.path_segment(pk))
+            for pk in ids[:BATCH_SIZE]
+        ]
+        if not batch:
+            return
+        Comment.objects.bulk_update(batch, ['path'])
+
+
+def _seed_posts(rng, fake, reader, authors, posts, groups):
+    _bulk(Group, (
+        Group(
+            description=fake.sentence(),
+            slug=f'group-{number}',
+            title=fake.word().capitalize(),
+        ) for number in range(groups)
+    ))
+    group_ids = [*Group.objects.values_list('pk', flat=True), None]
+    author_ids = [reader.pk] * 20 + rng.choices(
+        authors, cum_weights=_zipf(len(authors)), k=posts - 20
+    )
+    group_ids = rng.choices(
+        group_ids, cum_weights=_zipf(len(group_ids)), k=posts
+    )
+    _bulk(Post, (
+        Post(author_id=author_id, group_id=group_id, text=fake.text(300))
+        for author_id, group_id in zip(author_ids, group_ids)
+    ))
+
+
+def _seed_follows(rng, reader, authors, follows):
+    pairs = {(reader.pk, author_id) for author_id in authors[:follows]}
+    # Самые читаемые авторы - не обязательно самые плодовитые.
+    popular = rng.sample(authors, len(authors))
+    weights = _zipf(len(popular))
+    for user_id in authors:
+        k = rng.randint(0, follows * 2)
+        for author_id in rng.choices(popular, cum_weights=weights, k=k):
+            if author_id != user_id:
+                pairs.add((user_id, author_id))
+    _bulk(
+        Follow,
+        (Follow(user_id=user, author_id=author) for user, author in pairs),
+        ignore_conflicts=True,
+    )
+
+
+def _seed_comments(rng, fake, authors, comments):
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    rng.shuffle(post_ids)
+    post_ids = rng.choices(
+        post_ids, cum_weights=_zipf(len(post_ids)), k=comments
+    )
+    _bulk(Comment, (
+        Comment(author_id=author_id, post_id=post_id, text=fake.sentence())
+        for post_id, author_id in zip(
+            post_ids, rng.choices(authors, k=comments)
+        )
+    ))
+    _fill_comment_paths()
+
+
+def seed(users=2000, posts=50000, follows=30, comments=20000, groups=50):
+    """Заполняет пустую базу; follows - среднее число подписок.
+
+    Счётчики, поисковый индекс и ленты строятся после вставки теми же
+    функциями, что чинят их в рабочей базе.
+    """
+    fake = Faker('ru_RU')
+    fake.seed_instance(0)
+    rng = random.Random(0)
+    password = make_password(None)
+    reader = User.objects.create_user(READER)
+    _bulk(User, (
+        User(
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            password=password,
+            username=f'user{number}',
+        ) for number in range(users)
+    ))
+    authors = list(User.objects.exclude(pk=reader.pk).values_list(
+        'pk', flat=True
+    ).order_by('pk'))
+    _seed_posts(rng, fake, reader, authors, posts, groups)
+    _seed_follows(rng, reader, authors, follows)
+    _seed_comments(rng, fake, authors, comments)
+    recount()
+    search.rebuild()
+    for user in User.objects.order_by('pk').iterator():
+        timeline.rebuild(user)
+    cache.clear()
+
+
+def fixtures():
+    """Объекты, на которых меряются страницы: самые нагруженные."""
+    reader = User.objects.get(username=READER)
+    followed = Follow.objects.filter(user=reader).values('author')
+    hot_post = Post.objects.order_by('-comment_count', 'pk').first()
+    return {
+        'reader': reader,
+        'celebrity': User.objects.order_by(
+            '-profile__follower_count', 'pk'
+        ).first(),
+        'followed': User.objects.filter(pk__in=followed).order_by(
+            'pk'
+        ).first(),
+        'group': Group.objects.order_by('-post_count', 'pk').first(),
+        'hot_post': hot_post,
+        # Удаление поста проходит по его комментариям, поэтому берётся
+        # пост читателя с наименьшим их числом.
+        'own_post': reader.posts.order_by('comment_count', 'pk').first(),
+        'stranger': User.objects.exclude(pk__in=followed).exclude(
+            pk=reader.pk
+        ).order_by('pk').first(),
+        'word': re.findall(r'\w+', hot_post.text)[0].lower(),
+    }
+
+
+def endpoints(fx):
+    """Запрос для каждого имени из posts/urls.py."""
+    hot, own, slug = fx['hot_post'].pk, fx['own_post'].pk, fx['group'].slug
+    return {
+        'add_comment': Endpoint(
+            'post', (hot,), {'text': 'Бенчмарк'}, auth=True, mutates=True
+        ),
+        'follow_index': Endpoint('get', auth=True),
+        'group_create': Endpoint('get', auth=True),
+        'group_delete': Endpoint('get', (slug,), auth=True, mutates=True),
+        'group_edit': Endpoint('get', (slug,), auth=True),
+        'group_list': Endpoint('get', (slug,)),
+        'groups': Endpoint('get'),
+        'index': Endpoint('get'),
+        'post_comments': Endpoint(
+            'get', (hot,), {'cursor': comment_page(fx['hot_post']).next_cursor}
+        ),
+        'post_create': Endpoint('get', auth=True),
+        'post_delete': Endpoint('get', (own,), auth=True, mutates=True),
+        'post_detail': Endpoint('get', (hot,)),
+        'post_edit': Endpoint('get', (own,), auth=True),
+        'profile': Endpoint('get', (fx['celebrity'].username,)),
+        'profile_follow': Endpoint(
+            'get', (fx['stranger'].username,), auth=True, mutates=True
+        ),
+        'profile_unfollow': Endpoint(
+            'get', (fx['followed'].username,), auth=True, mutates=True
+        ),
+        'search': Endpoint('get', data={'q': fx['word']}),
+    }
+
+
+def uncovered(names):
+    """Имена страниц posts/urls.py, для которых не задан запрос."""
+    return sorted(
+        pattern.name for pattern in urls.urlpatterns
+        if pattern.name not in names
+    )
+
+
+@contextmanager
+def _rolled_back(endpoint):
+    """Изменяющие запросы откатываются, чтобы данные не менялись."""
+    if not endpoint.mutates:
+        yield
+        return
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def _request(client, url, endpoint):
+    # Журнал запросов ограничен 9000 записей; переполненный он перестаёт
+    # расти, и CaptureQueriesContext насчитал бы ноль.
+    reset_queries()
+    with _rolled_back(endpoint):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, endpoint.method)(url, endpoint.data)
+    if response.status_code >= 400:
+        raise AssertionError(f'{url}: ответ {response.status_code}')
+    return len(queries)
+
+
+def _timings(client, url, endpoint, repeat, cold):
+    """Задержки в миллисекундах, по возрастанию."""
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        _request(client, url, endpoint)
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)
+
+
+def measure(client, url, endpoint, repeat):
+    """Запросы и задержки с холодным и тёплым кэшем, пик памяти."""
+    cache.clear()
+    queries = _request(client, url, endpoint)
+    warm_queries = _request(client, url, endpoint)
+    cold = _timings(client, url, endpoint, repeat, cold=True)
+    # Последний холодный запрос уже заполнил кэш.
+    warm = _timings(client, url, endpoint, repeat, cold=False)
+    cache.clear()
+    tracemalloc.start()
+    try:
+        _request(client, url, endpoint)
+        memory = tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+    return {
+        'queries': queries,
+        'warm_queries': warm_queries,
+        'p50': round(percentile(cold, 0.5), 2),
+        'p99': round(percentile(cold, 0.99), 2),
+        'warm_p50': round(percentile(warm, 0.5), 2),
+        'warm_p99': round(percentile(warm, 0.99), 2),
+        'memory': memory,
+    }
+
+
+def run(repeat=20):
+    """Меряет все страницы; возвращает словарь результатов по именам."""
+    fx = fixtures()
+    anonymous, reader = Client(), Client()
+    reader.force_login(fx['reader'])
+    results = {}
+    for name, endpoint in sorted(endpoints(fx).items()):
+        url = reverse(f'posts:{name}', args=endpoint.args)
+        client = reader if endpoint.auth else anonymous
+        results[name] = measure(client, url, endpoint, repeat)
+    return results
+
+
+def compare(results, baseline, tolerance=0.5):
+    """Регрессии относительно базовой линии в виде сообщений.
+
+    Число запросов не должно расти вовсе; задержки p99 с холодным и
+    тёплым кэшем и память - не больше чем в 1 + tolerance раз и не
+    меньше чем на порог шума.
+    """
+    problems = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            problems.append(f'{name}: нет базовой линии')
+            continue
+        for metric in ('queries', 'warm_queries'):
+            if result[metric] > base[metric]:
+                problems.append(
+                    f'{name}: {metric} {result[metric]} > {base[metric]}'
+                )
+        for metric, noise in (('p99', MIN_TIME_DELTA),
+                              ('warm_p99', MIN_TIME_DELTA),
+                              ('memory', MIN_MEMORY_DELTA)):
+            limit = max(base[metric] * (1 + tolerance), base[metric] + noise)
+            if result[metric] > limit:
+                problems.append(
+                    f'{name}: {metric} {result[metric]} > {limit:.1f}'
+                )
+    return problems
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['endpoints']
+
+
+def save_baseline(path, results, volumes):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(
+            {'volumes': volumes, 'endpoints': results},
+            file,
+            ensure_ascii=False,
+            indent=2,
+            sort_keys=True,
+        )
+        file.write('\n')
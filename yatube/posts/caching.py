@@ -0,0 +1,270 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from core.cache.tiered import TwoTierCache
+from core.db.replicas import current_replica
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import objects
+from .models import Post
+
+GLOBAL_SCOPES = ('groups', 'users')
+
+pages = TwoTierCache(
+    'pages',
+    max_entries=settings.CACHE_L1_MAX_ENTRIES,
+    local_timeout=settings.CACHE_L1_TIME,
+)
+
+
+def _generation_key(scope):
+    return f'generation:{scope}'
+
+
+def _modified_key(scope):
+    return f'modified:{scope}'
+
+
+def generations(scopes):
+    """Текущие номера поколений для областей кэша.
+
+    Отсутствующее поколение заводится от текущего времени, поэтому после
+    вытеснения счётчика из кэша старые страницы не оживают.
+    """
+    keys = [_generation_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        values.update(cache.get_many(missing))
+    return [values.get(key, 0) for key in keys]
+
+
+def bump(*scopes):
+    """Сдвигает поколения, делая устаревшими все страницы этих областей.
+
+    Внутри транзакции поколения сдвигаются ещё раз после коммита: до
+    него читатель видит старые строки и мог закэшировать их под уже
+    сдвинутым поколением.
+    """
+    _bump(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    now = time.time()
+    for scope in scopes:
+        try:
+            cache.incr(_generation_key(scope))
+        except ValueError:
+            # Поколение ещё не заводилось - под ним нечего сбрасывать.
+            pass
+    cache.set_many({_modified_key(scope): now for scope in scopes}, None)
+
+
+def last_modified(scopes):
+    """Время последнего изменения областей.
+
+    Неизвестное время (ключ вытеснен или ещё не заводился) считается
+    текущим: лишний полный ответ лучше устаревшего 304.
+    """
+    keys = [_modified_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in values:
+            cache.add(key, now, None)
+            values[key] = now
+    return max(values.values(), default=now)
+
+
+def replica_may_lag(scopes):
+    """Страница читается с реплики, которая могла не догнать изменения.
+
+    Такую страницу нельзя ни кэшировать, ни подтверждать ответом 304:
+    она записалась бы под новым поколением со старым содержимым.
+    """
+    return current_replica() is not None and (
+        time.time() - last_modified(scopes) < settings.DATABASE_REPLICA_LAG
+    )
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def username_scope(username):
+    """Область страниц автора по username из адреса.
+
+    Области заводятся по id, чтобы сигналы не читали username автора
+    (и slug группы) для каждого изменённого поста.
+    """
+    user = objects.users.get_by(username)
+    return author_scope(user.pk if user else 0)
+
+
+def slug_scope(slug):
+    group = objects.groups.get_by(slug)
+    return group_scope(group.pk if group else 0)
+
+
+def post_scopes(post_id, author_id, *group_ids):
+    """Области страниц, на которых виден пост."""
+    return [
+        'posts',
+        f'post:{post_id}',
+        author_scope(author_id),
+        *(group_scope(pk) for pk in set(group_ids) if pk is not None),
+    ]
+
+
+def bump_post(post_id, *group_ids):
+    """Сбрасывает страницы поста, его автора и групп, где он был."""
+    author_id, group_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first() or (None, None)
+    bump(*post_scopes(post_id, author_id, group_id, *group_ids))
+
+
+def post_author(post_id):
+    """id автора поста; автор поста не меняется, поэтому кэшируется."""
+    key = f'post_author_id:{post_id}'
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True
+        ).first() or 0
+        cache.set(key, author_id, settings.CACHE_TIME)
+    return author_id
+
+
+def _freeze(response):
+    """Неизменяемый снимок ответа, который можно раздавать из L1."""
+    return (
+        response.content,
+        response.status_code,
+        tuple(response.items()),
+    )
+
+
+def _thaw(frozen):
+    content, status, headers = frozen
+    response = HttpResponse(content, status=status)
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+def _session_parts(request):
+    """Части ключа, отличающие страницу вошедшего пользователя."""
+    if not request.user.is_authenticated:
+        return []
+    return [
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ]
+
+
+def cache_generations(scopes):
+    """Кэширует GET-ответ view, пока не сменилось поколение его областей.
+
+    scopes получает именованные аргументы view и возвращает области, от
+    которых зависит страница; к ним добавляются общие GLOBAL_SCOPES.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            parts = [view.__name__, request.get_full_path()]
+            parts += _session_parts(request)
+            all_scopes = [*scopes(**kwargs), *GLOBAL_SCOPES]
+            if replica_may_lag(all_scopes):
+                return view(request, *args, **kwargs)
+            parts += generations(all_scopes)
+            key = 'page:' + hashlib.md5(
+                ':'.join(map(str, parts)).encode()
+            ).hexdigest()
+            rendered = []
+
+            def render():
+                response = view(request, *args, **kwargs)
+                rendered.append(response)
+                if response.status_code == 200 and not response.streaming:
+                    return _freeze(response)
+                return None
+
+            frozen = pages.get_or_set(
+                key, render, settings.PAGE_CACHE_TIME
+            )
+            return rendered[0] if frozen is None else _thaw(frozen)
+        return wrapper
+    return decorator
+
+
+def _revalidated(view):
+    """Кэши (браузер, CDN) хранят страницу, но перепроверяют её.
+
+    Личную страницу вошедшего пользователя хранит только браузер.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        patch_cache_control(
+            response,
+            no_cache=True,
+            private=request.user.is_authenticated,
+        )
+        return response
+    return wrapper
+
+
+def conditional(scopes, per_user=False, per_session=False):
+    """Условный GET по поколениям областей: ETag и Last-Modified.
+
+    scopes получает запрос и именованные аргументы view. Проверка идёт
+    только по кэшу, поэтому ответ 304 не обращается к базе.
+    per_user - ответ зависит от пользователя API; per_session - HTML
+    для вошедшего пользователя: его ETag учитывает сессию, а без
+    Last-Modified вход или выход не оставят в браузере чужую страницу.
+    """
+    def all_scopes(request, kwargs):
+        return [*scopes(request, **kwargs), *GLOBAL_SCOPES]
+
+    def etag(request, *args, **kwargs):
+        if replica_may_lag(all_scopes(request, kwargs)):
+            return None
+        parts = [request.get_full_path()]
+        if per_user:
+            parts.append(request.user.pk)
+        if per_session:
+            parts += _session_parts(request)
+        parts += generations(all_scopes(request, kwargs))
+        return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+    def modified(request, *args, **kwargs):
+        if per_session and request.user.is_authenticated:
+            return None
+        if replica_may_lag(all_scopes(request, kwargs)):
+            return None
+        return datetime.fromtimestamp(
+            last_modified(all_scopes(request, kwargs)), timezone.utc
+        )
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=modified)(view)
+        return _revalidated(view) if per_session else view
+    return decorator
@@ -0,0 +1,62 @@
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def add(model, pk, **deltas):
+    """Атомарно сдвигает счётчики строки на заданные величины."""
+    if pk is None:
+        return
+    model.objects.filter(pk=pk).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def _actual(queryset, field):
+    """Подзапрос с фактическим числом строк queryset для внешней строки."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('*')).values('total')
+        ),
+        0,
+    )
+
+
+def recount(apps=global_apps):
+    """Пересчитывает все счётчики по данным и создаёт пропущенные профили.
+
+    Возвращает словарь с числом исправленных строк для каждого счётчика.
+    """
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Profile = apps.get_model('posts', 'Profile')
+    User = Profile._meta.get_field('user').related_model
+
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True
+    )
+    # Размер пачки выбирает Django: у SQLite он ограничен числом
+    # параметров и слагаемых в одном INSERT.
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in missing.iterator()]
+    )
+    counters = (
+        (Group, 'post_count', _actual(Post.objects.all(), 'group')),
+        (Post, 'comment_count', _actual(Comment.objects.all(), 'post')),
+        (Profile, 'follower_count', _actual(Follow.objects.all(), 'author')),
+        (Profile, 'following_count', _actual(Follow.objects.all(), 'user')),
+        (Profile, 'post_count', _actual(Post.objects.all(), 'author')),
+    )
+    fixed = {}
+    for model, field, actual in counters:
+        drifted = model.objects.annotate(actual=actual).filter(
+            ~Q(**{field: F('actual')})
+        ).values('pk')
+        fixed[f'{model.__name__}.{field}'] = model.objects.filter(
+            pk__in=drifted
+        ).update(**{field: actual})
+    return fixed
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import clean_upload
 from .models import Comment, Group, Post
 
 
@@ -11,6 +13,24 @@ class CommentForm(forms.ModelForm):
         )
 
 
+class ReplyForm(CommentForm):
+    """Комментарий или ответ: parent - комментарий того же поста."""
+
+    class Meta(CommentForm.Meta):
+        fields = (
+            'text',
+            'parent',
+        )
+
+    def clean_parent(self):
+        parent = self.cleaned_data.get('parent')
+        if parent is not None and parent.post_id != self.instance.post_id:
+            raise forms.ValidationError(
+                'Можно ответить только на комментарий к этому посту'
+            )
+        return parent
+
+
 class GroupForm(forms.ModelForm):
     class Meta():
         model = Group
@@ -39,3 +59,9 @@ class PostForm(forms.ModelForm):
                 "new": "Текст нового поста",
             },
         }
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return clean_upload(image)
+        return image
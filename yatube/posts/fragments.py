@@ -0,0 +1,88 @@
+"""Кэш отрисованных карточек постов для лент.
+
+Ключ карточки - id поста и отпечаток всего, что в неё выводится (текст,
+счётчик комментариев, имя автора, группа, миниатюры, сами шаблоны),
+поэтому сбрасывать карточки не нужно: изменившийся пост просто получает
+новый ключ, а старый истекает сам. Страница из десяти карточек читается
+одним get_many, отрисовываются только промахи.
+"""
+import hashlib
+from functools import lru_cache
+
+from core.cache.tiered import CacheMetrics
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template, render_to_string
+from django.template.loader_tags import IncludeNode
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+CARD_TEMPLATE = 'posts/includes/card.html'
+
+metrics = CacheMetrics('fragments:cards', metric_names=('hits', 'misses'))
+
+
+def _sources(name, seen):
+    """Исходники шаблона и всех включённых в него по include."""
+    if name in seen:
+        return
+    seen.add(name)
+    template = get_template(name).template
+    yield template.source
+    for node in template.nodelist.get_nodes_by_type(IncludeNode):
+        included = node.template.var
+        # Имя, вычисляемое при отрисовке, заранее не узнать.
+        if isinstance(included, str):
+            yield from _sources(included, seen)
+
+
+@lru_cache(maxsize=None)
+def _template_digest():
+    """Отпечаток исходников карточки: новая разметка - новые ключи."""
+    digest = hashlib.md5()
+    for source in _sources(CARD_TEMPLATE, set()):
+        digest.update(source.encode())
+    return digest.hexdigest()[:8]
+
+
+def card_key(post, show_author, show_group):
+    parts = [
+        _template_digest(),
+        get_language(),
+        show_author,
+        show_group,
+        post.text,
+        post.pub_date.isoformat(),
+        post.comment_count,
+        post.image.name,
+        post.thumbnails,
+        post.author.username,
+        post.author.get_full_name(),
+    ]
+    if post.group_id is not None:
+        parts += [post.group.slug, post.group.title]
+    digest = hashlib.md5(
+        '\x1f'.join(map(str, parts)).encode()
+    ).hexdigest()
+    return f'card:{post.pk}:{digest}'
+
+
+def render_cards(posts, show_author=True, show_group=True):
+    """Пары (пост, HTML карточки) в порядке posts."""
+    posts = list(posts)
+    keys = [card_key(post, show_author, show_group) for post in posts]
+    found = cache.get_many(keys)
+    metrics.count('hits', len(found))
+    rendered = {}
+    for post, key in zip(posts, keys):
+        if key not in found:
+            rendered[key] = render_to_string(CARD_TEMPLATE, {
+                'post': post,
+                'show_author': show_author,
+                'show_group': show_group,
+            })
+    metrics.count('misses', len(rendered))
+    if rendered:
+        cache.set_many(rendered, settings.CACHE_TIME)
+        found.update(rendered)
+    return [(post, mark_safe(found[key])) for post, key in zip(posts, keys)]
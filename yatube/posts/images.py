@@ -0,0 +1,46 @@
+"""Проверка и очистка картинок, загружаемых к постам."""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+JPEG_QUALITY: int = 90
+
+
+def clean_upload(upload):
+    """Загруженная картинка без метаданных и не больше допустимых размеров.
+
+    Слишком тяжёлые файлы отклоняются, слишком большие по сторонам -
+    уменьшаются. Файл без EXIF и в пределах размеров остаётся как есть.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ',
+            params={'limit': settings.POST_IMAGE_MAX_BYTES // 2 ** 20},
+        )
+    upload.seek(0)
+    # Image.open читает только заголовок - до распаковки пикселей.
+    with Image.open(upload) as image:
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError('Слишком большое разрешение картинки')
+        too_big = max(width, height) > settings.POST_IMAGE_MAX_SIDE
+        if not too_big and not image.getexif():
+            upload.seek(0)
+            return upload
+        if getattr(image, 'is_animated', False):
+            # Кадры анимации не пересобираются, а EXIF у GIF не бывает.
+            raise ValidationError('Слишком большая анимированная картинка')
+        format_ = image.format
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(
+            (settings.POST_IMAGE_MAX_SIDE, settings.POST_IMAGE_MAX_SIDE)
+        )
+        buffer = BytesIO()
+        options = {'quality': JPEG_QUALITY} if format_ == 'JPEG' else {}
+        image.save(buffer, format_, **options)
+    return SimpleUploadedFile(
+        upload.name, buffer.getvalue(), upload.content_type
+    )
@@ -0,0 +1,76 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from posts import benchmark
+from posts.models import Post
+
+BASELINE = os.path.join(settings.BASE_DIR, 'posts', 'benchmarks.json')
+VOLUMES = ('users', 'posts', 'follows', 'comments', 'groups')
+
+
+class Command(BaseCommand):
+    help = (
+        'Число запросов, задержки и память страниц posts на тестовой '
+        'базе с заполненными данными; сравнение с базовой линией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=30)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--tolerance', type=float, default=0.5)
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument(
+            '--save',
+            action='store_true',
+            help='Записать результаты как новую базовую линию.',
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Не удалять тестовую базу: данные заполнятся один раз.',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(
+            options['verbosity'], interactive=False, keepdb=options['keepdb']
+        )
+        try:
+            volumes = {name: options[name] for name in VOLUMES}
+            if not Post.objects.exists():
+                self.stdout.write(f'Заполнение базы: {volumes}')
+                benchmark.seed(**volumes)
+            results = benchmark.run(options['repeat'])
+        finally:
+            teardown_databases(
+                old_config, options['verbosity'], keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+        for name, result in sorted(results.items()):
+            self.stdout.write(
+                '{name:18} запросов {queries:3} / {warm_queries:3}, '
+                'p50 {p50:8.2f} / {warm_p50:6.2f} мс, '
+                'p99 {p99:8.2f} / {warm_p99:6.2f} мс, '
+                'память {memory:6} КиБ'.format(name=name, **result)
+            )
+        missing = benchmark.uncovered(results)
+        if missing:
+            raise CommandError(f'Нет запросов для страниц: {missing}')
+        if options['save']:
+            benchmark.save_baseline(options['baseline'], results, volumes)
+            self.stdout.write(f'Базовая линия: {options["baseline"]}')
+            return
+        problems = benchmark.compare(
+            results,
+            benchmark.load_baseline(options['baseline']),
+            options['tolerance'],
+        )
+        if problems:
+            raise CommandError('Регрессии:\n' + '\n'.join(problems))
@@ -0,0 +1,98 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие миниатюры картинок постов, удаляет файлы '
+        'картинок и миниатюр без постов и чистит KV-хранилище sorl.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать миниатюры всех постов с картинками.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            default=500,
+            type=int,
+            help='Сколько записей читать из базы за раз.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать, ничего не создавать и не удалять.',
+        )
+        parser.add_argument(
+            '--workers',
+            default=4,
+            type=int,
+            help='Процессов для создания миниатюр (0 - в этом процессе).',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        started = time.monotonic()
+
+        posts = Post.objects.all()
+        if not options['all']:
+            posts = posts.filter(thumbnails='{}')
+        done = failed = 0
+        if dry_run:
+            done = posts.exclude(image='').count()
+        else:
+            for post_id, error in thumbnails.regenerate(
+                posts, options['workers'], batch_size
+            ):
+                if error is None:
+                    done += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f'Пост {post_id}: {error}')
+        self.report(
+            'Миниатюры', started, done, 'постов',
+            f'нужно создать для {done} постов' if dry_run else
+            f'создано для {done} постов, с ошибками {failed}',
+        )
+
+        started = time.monotonic()
+        images, used_thumbnails = thumbnails.referenced(batch_size)
+        scanned = reclaimed = 0
+        deleted, present = set(), set()
+        for name, orphan in thumbnails.orphans(images, used_thumbnails):
+            scanned += 1
+            if not orphan:
+                present.add(name)
+                continue
+            reclaimed += default_storage.size(name)
+            if not dry_run:
+                default_storage.delete(name)
+            deleted.add(name)
+        self.report(
+            'Файлы', started, scanned, 'файлов',
+            f'просмотрено {scanned}, удалено {len(deleted)}, '
+            f'освобождено {reclaimed / 2 ** 20:.1f} МБ',
+        )
+
+        started = time.monotonic()
+        removed = thumbnails.clean_kvstore(
+            deleted, present, batch_size, dry_run
+        )
+        self.report(
+            'KV-хранилище', started, removed, 'записей',
+            f'удалено записей {removed}',
+        )
+
+    def report(self, stage, started, count, unit, summary):
+        elapsed = time.monotonic() - started
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{stage}: {summary} за {elapsed:.1f} с ({rate:.0f} {unit}/с)'
+        )
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Строит заново поисковый индекс постов и комментариев.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Проиндексировано документов: {search.rebuild()}')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Пользователи, чьи ленты нужно пересобрать (по умолчанию все)'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        rebuilt = entries = 0
+        for user in users.iterator():
+            entries += timeline.rebuild(user)
+            rebuilt += 1
+        self.stdout.write(
+            f'Пересобрано лент: {rebuilt}, записей: {entries}'
+        )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок.'
+
+    def handle(self, *args, **options):
+        for counter, fixed in recount().items():
+            self.stdout.write(f'{counter}: исправлено строк {fixed}')
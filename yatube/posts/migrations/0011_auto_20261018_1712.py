@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:12
+
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from posts import search
+    search.create_schema(schema_editor)
+    search.rebuild(apps)
+
+
+def drop_index(apps, schema_editor):
+    from posts import search
+    search.drop_schema(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_auto_20261018_1710'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_auto_20261018_1712'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails',
+            field=models.TextField(default='{}', editable=False, verbose_name='Миниатюры картинки'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:26
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+def remove_invalid_follows(apps, schema_editor):
+    from posts.counters import recount
+    Follow = apps.get_model('posts', 'Follow')
+    removed = Follow.objects.filter(user=models.F('author')).delete()[0]
+    duplicates = Follow.objects.filter(
+        pk__gt=models.Subquery(
+            Follow.objects.filter(
+                user=models.OuterRef('user'),
+                author=models.OuterRef('author'),
+            ).order_by('pk').values('pk')[:1]
+        )
+    )
+    removed += duplicates.delete()[0]
+    if removed:
+        recount(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_invalid_follows, migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='pub_date',
+            field=models.DateTimeField(auto_now_add=True, help_text='Дата публикации поста', verbose_name='Дата публикации поста'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created', 'id'], name='posts_comme_post_id_9660d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='posts_post_pub_dat_d3c0cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='posts_post_author__075f1d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='posts_post_group_i_6a7ae9_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='posts_follow_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='posts_follow_not_self'),
+        ),
+    ]
@@ -1,10 +1,46 @@
+import json
+import threading
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router, transaction
 
 User = get_user_model()
 
+_deleting = threading.local()
+
+
+class CountedModel(models.Model):
+    """Модель со счётчиками, которые меняют только атомарные UPDATE.
+
+    Значения счётчиков в памяти могут устареть, пока объект
+    редактируется, поэтому обычное сохранение существующей строки
+    записывает все поля, кроме counter_fields.
+    """
+
+    counter_fields = ()
 
-class Group(models.Model):
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CountedModel):
     description = models.TextField(
         verbose_name='Описание группы',
         help_text='Описание группы',
@@ -20,11 +56,52 @@ class Group(models.Model):
         help_text='Название группы'
     )
 
+    post_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов',
+    )
+
+    counter_fields = ('post_count',)
+
     def __str__(self) -> str:
         return self.title
 
+    def delete(self, *args, **kwargs):
+        # Каскад SET_NULL выбрал бы все посты группы и открепил их
+        # пачками по id: число запросов росло бы с размером группы.
+        using = kwargs.get('using') or router.db_for_write(
+            Group, instance=self
+        )
+        with transaction.atomic(using=using):
+            self.posts.using(using).update(group=None)
+            return super().delete(*args, **kwargs)
+
+
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты в том виде, в каком их показывают ленты.
+
+        Автор и группа подтягиваются одним JOIN, выбираются только
+        выводимые в шаблонах колонки.
+        """
+        return self.select_related('author', 'group').only(
+            'author',
+            'author__first_name',
+            'author__last_name',
+            'author__username',
+            'comment_count',
+            'group',
+            'group__slug',
+            'group__title',
+            'image',
+            'pub_date',
+            'text',
+            'thumbnails',
+        )
 
-class Post(models.Model):
+
+class Post(CountedModel):
     author = models.ForeignKey(
         User,
         help_text='Автор поста',
@@ -32,6 +109,11 @@ class Post(models.Model):
         related_name='posts',
         verbose_name='Автор поста',
     )
+    comment_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
     group = models.ForeignKey(
         Group,
         blank=True,
@@ -48,7 +130,6 @@ class Post(models.Model):
     )
     pub_date = models.DateTimeField(
         auto_now_add=True,
-        db_index=True,
         help_text='Дата публикации поста',
         verbose_name='Дата публикации поста',
     )
@@ -56,17 +137,76 @@ class Post(models.Model):
         help_text='Введите текст поста',
         verbose_name='Текст поста',
     )
+    thumbnails = models.TextField(
+        default='{}',
+        editable=False,
+        verbose_name='Миниатюры картинки',
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    counter_fields = ('comment_count',)
+
+    @staticmethod
+    def deleting_ids():
+        """Id постов, которые удаляет delete() в этом потоке."""
+        if not hasattr(_deleting, 'ids'):
+            _deleting.ids = set()
+        return _deleting.ids
+
+    def delete(self, *args, **kwargs):
+        # Комментарии уходят каскадом; их сигналы пропускают работу по
+        # каждому комментарию, сигналы поста делают её разом.
+        # delete() обнуляет pk, поэтому он запоминается заранее.
+        pk, deleting = self.pk, self.deleting_ids()
+        deleting.add(pk)
+        try:
+            return super().delete(*args, **kwargs)
+        finally:
+            deleting.discard(pk)
+
+    @property
+    def thumbnail_set(self):
+        """Готовые миниатюры по названиям размеров, пока их нет - пусто."""
+        return json.loads(self.thumbnails)
 
     def __str__(self) -> str:
         return self.text[:15]
 
     class Meta:
+        # Индексы повторяют порядок ключа пагинации (pub_date, id) в лентах.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id']),
+            models.Index(fields=['author', '-pub_date', '-id']),
+            models.Index(fields=['group', '-pub_date', '-id']),
+        ]
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
 
+class CommentQuerySet(models.QuerySet):
+    def subtree(self, comment):
+        """Комментарий и все ответы на него в порядке обхода ветки.
+
+        Пути ответов начинаются с пути комментария и точки, а "/" идёт
+        в ASCII сразу за ".", поэтому ветка - один диапазон индекса.
+        """
+        return self.filter(
+            path__gte=comment.path, path__lt=comment.path + '/'
+        )
+
+
 class Comment(models.Model):
+    """Комментарий; ответы образуют дерево с материализованным путём.
+
+    path - id всех предков и самого комментария фиксированной ширины
+    через точку, поэтому сортировка по path даёт обход дерева в глубину.
+    """
+
+    PATH_WIDTH = 10
+    PATH_SEPARATOR = '.'
+
     created = models.DateTimeField(
         auto_now_add=True,
         db_index=True,
@@ -78,6 +218,25 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments'
     )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Уровень вложенности',
+    )
+    parent = models.ForeignKey(
+        'self',
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='replies',
+        verbose_name='Ответ на комментарий',
+    )
+    path = models.CharField(
+        default='',
+        editable=False,
+        max_length=255,
+        verbose_name='Путь в дереве комментариев',
+    )
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -88,6 +247,56 @@ class Comment(models.Model):
         verbose_name='Текст комментария',
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id']),
+            models.Index(fields=['post', 'path']),
+        ]
+
+    @classmethod
+    def path_segment(cls, pk):
+        return str(pk).zfill(cls.PATH_WIDTH)
+
+    def _attach(self):
+        """Глубина ответа; слишком глубокий ответ уходит к предку.
+
+        Ответ на комментарий уровня COMMENTS_MAX_DEPTH становится ответом
+        на его предка уровнем выше, так что ветка не растёт вглубь.
+        """
+        parent = self.parent
+        if parent.post_id != self.post_id:
+            raise ValueError('Ответ должен относиться к тому же посту')
+        if parent.depth >= settings.COMMENTS_MAX_DEPTH:
+            ancestor = parent.path.split(self.PATH_SEPARATOR)[
+                settings.COMMENTS_MAX_DEPTH - 1
+            ]
+            parent = self.parent = Comment.objects.get(pk=int(ancestor))
+        self.depth = parent.depth + 1
+
+    def save(self, *args, **kwargs):
+        if self.path:
+            return super().save(*args, **kwargs)
+        if self.parent_id:
+            self._attach()
+        using = kwargs.get('using') or router.db_for_write(
+            Comment, instance=self
+        )
+        # Без пути комментарий не виден в ветке: INSERT и запись пути
+        # фиксируются вместе.
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            # Путь включает собственный id, известный только после INSERT.
+            self.path = self.path_segment(self.pk)
+            if self.parent_id:
+                self.path = (
+                    self.parent.path + self.PATH_SEPARATOR + self.path
+                )
+            Comment.objects.using(using).filter(pk=self.pk).update(
+                path=self.path
+            )
+
 
 class Follow(models.Model):
     author = models.ForeignKey(
@@ -102,5 +311,75 @@ class Follow(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='posts_follow_unique',
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='posts_follow_not_self',
+            ),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class Profile(CountedModel):
+    """Счётчики пользователя, которые обновляются сигналами."""
+
+    follower_count = models.IntegerField(
+        db_index=True,
+        default=0,
+        verbose_name='Число подписчиков',
+    )
+    following_count = models.IntegerField(
+        default=0,
+        verbose_name='Число подписок',
+    )
+    post_count = models.IntegerField(
+        default=0,
+        verbose_name='Число постов',
+    )
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile',
+    )
+
+    counter_fields = ('follower_count', 'following_count', 'post_count')
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField()
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post']),
+            models.Index(fields=['user', 'author']),
+        ]
+        unique_together = ('user', 'post')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
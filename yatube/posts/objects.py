@@ -0,0 +1,216 @@
+"""Кэш объектов Post, Group и User по id и естественному ключу.
+
+Объект лежит в общем кэше под своим pk, а естественный ключ (slug,
+username) хранит только указатель на pk. Сигналы стирают объект при
+изменении; указатель проверяется при чтении, поэтому после смены slug
+старый указатель ведёт к объекту с другим slug и считается промахом.
+Связанные объекты (автор и группа поста) хранятся в своих кэшах и
+подставляются одним обращением к кэшу для всего списка. Все ключи
+содержат номер версии: после миграций он сдвигается, и старые объекты
+перестают читаться без очистки всего общего кэша.
+"""
+import hashlib
+import time
+
+from core.cache.tiered import CacheMetrics
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from .models import Group, Post, User
+
+VERSION_KEY = 'objects:version'
+# Процесс перечитывает номер версии не чаще раза в VERSION_CHECK секунд.
+VERSION_CHECK = 60
+
+
+class _Version:
+    value = None
+    checked = 0.0
+
+
+def version():
+    """Номер версии кэша объектов."""
+    if (
+        _Version.value is None
+        or time.monotonic() - _Version.checked > VERSION_CHECK
+    ):
+        # Как и поколения страниц, версия заводится от текущего времени:
+        # после вытеснения ключа старые объекты не оживают.
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        _Version.value = cache.get(VERSION_KEY, 0)
+        _Version.checked = time.monotonic()
+    return _Version.value
+
+
+def bump_version():
+    """Делает устаревшими все закэшированные объекты."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+    _Version.value = None
+
+
+class ObjectCache(CacheMetrics):
+    """Объекты модели по pk и, если задано поле field, по его значению.
+
+    select - связи, которые кэшируются вместе с объектом; related -
+    пары (связь, ObjectCache), объекты которых хранятся отдельно; only -
+    единственные поля, которые попадают в кэш (остальные при обращении
+    дочитываются из базы). Промахи читаются из основной базы, чтобы
+    отстающая реплика не попала в кэш.
+    """
+
+    metric_names = ('hits', 'misses')
+
+    def __init__(self, name, model, field=None, select=(), related=(),
+                 only=None):
+        super().__init__(f'objects:{name}')
+        self.model = model
+        self.field = field
+        self.select = select
+        self.related = dict(related)
+        self.only = only
+
+    def key(self, pk):
+        return f'{self.name}:{version()}:{pk}'
+
+    def pointer_key(self, value):
+        digest = hashlib.md5(str(value).encode()).hexdigest()
+        return f'{self.name}:{version()}:{self.field}:{digest}'
+
+    def fields(self, prefix=''):
+        """Поля для only(): свои, связей из select и из related."""
+        meta = self.model._meta
+        names = list(self.only or (
+            field.name for field in meta.concrete_fields
+        ))
+        for name in self.select:
+            names += [
+                f'{name}__{field.name}' for field in
+                meta.get_field(name).related_model._meta.concrete_fields
+            ]
+        for name, related in self.related.items():
+            names += [name, *related.fields(f'{name}__')]
+        return [prefix + name for name in names]
+
+    def queryset(self):
+        names = list(self.select)
+        for name, related in self.related.items():
+            names += [name, *(f'{name}__{item}' for item in related.select)]
+        return self.model._default_manager.using('default').select_related(
+            *names
+        ).only(*self.fields())
+
+    def _store(self, objects):
+        """Кладёт объекты в кэш; связанные - в их собственные кэши."""
+        values, detached = {}, []
+        for obj in objects:
+            for name, related in self.related.items():
+                field = self.model._meta.get_field(name)
+                if field.is_cached(obj):
+                    value = field.get_cached_value(obj)
+                    field.delete_cached_value(obj)
+                    detached.append((field, obj, value))
+                    if value is not None:
+                        related._store([value])
+            values[self.key(obj.pk)] = obj
+            if self.field:
+                values[self.pointer_key(getattr(obj, self.field))] = obj.pk
+        # Объекты сериализуются без связей, потом связи возвращаются.
+        cache.set_many(values, settings.OBJECT_CACHE_TIME)
+        for field, obj, value in detached:
+            field.set_cached_value(obj, value)
+
+    def _load(self, pks):
+        objects = self.queryset().in_bulk(pks)
+        self._store(objects.values())
+        return objects
+
+    def get_many(self, pks):
+        """Словарь {pk: объект} для найденных pk."""
+        to_python = self.model._meta.pk.to_python
+        pks = list(dict.fromkeys(to_python(pk) for pk in pks))
+        found = cache.get_many([self.key(pk) for pk in pks])
+        objects = {
+            pk: found[self.key(pk)] for pk in pks if self.key(pk) in found
+        }
+        missing = [pk for pk in pks if pk not in objects]
+        self.count('hits', len(objects))
+        self.count('misses', len(missing))
+        hydrate(list(objects.values()), **self.related)
+        if missing:
+            objects.update(self._load(missing))
+        return objects
+
+    def get(self, pk):
+        return self.get_many([pk]).get(self.model._meta.pk.to_python(pk))
+
+    def get_by(self, value):
+        """Объект по естественному ключу или None."""
+        pk = cache.get(self.pointer_key(value))
+        if pk is not None:
+            obj = self.get(pk)
+            if obj is not None and getattr(obj, self.field) == value:
+                return obj
+        self.count('misses')
+        obj = self.queryset().filter(**{self.field: value}).first()
+        if obj is not None:
+            self._store([obj])
+        return obj
+
+    def get_or_404(self, value):
+        obj = self.get_by(value) if self.field else self.get(value)
+        if obj is None:
+            raise Http404(f'{self.model._meta.object_name} не найден')
+        return obj
+
+    def forget(self, *pks):
+        cache.delete_many([self.key(pk) for pk in pks if pk is not None])
+
+
+def hydrate(objects, **relations):
+    """Подставляет связанные объекты из их кэшей: hydrate(posts, author=users).
+
+    Все связи читаются из кэша одним get_many, промахи - одним запросом
+    к базе на модель.
+    """
+    if not objects:
+        return
+    fields = {name: objects[0]._meta.get_field(name) for name in relations}
+    wanted = {}
+    for name, related in relations.items():
+        for obj in objects:
+            pk = getattr(obj, fields[name].attname)
+            if pk is not None and not fields[name].is_cached(obj):
+                wanted[related.key(pk)] = (related, pk)
+    found = cache.get_many(list(wanted)) if wanted else {}
+    loaded = {}
+    for related in {owner for owner, _ in wanted.values()}:
+        keys = [key for key, (owner, _) in wanted.items() if owner is related]
+        hits = {wanted[key][1]: found[key] for key in keys if key in found}
+        missing = [wanted[key][1] for key in keys if key not in found]
+        related.count('hits', len(hits))
+        related.count('misses', len(missing))
+        hydrate(list(hits.values()), **related.related)
+        if missing:
+            hits.update(related._load(missing))
+        loaded[related] = hits
+    for name, related in relations.items():
+        for obj in objects:
+            pk = getattr(obj, fields[name].attname)
+            value = loaded.get(related, {}).get(pk)
+            if value is not None:
+                fields[name].set_cached_value(obj, value)
+
+
+# Пароль и прочие поля учётной записи в общий кэш не попадают.
+users = ObjectCache(
+    'users', User, field='username', select=('profile',),
+    only=('first_name', 'last_name', 'username'),
+)
+groups = ObjectCache('groups', Group, field='slug')
+posts = ObjectCache(
+    'posts', Post, related=(('author', users), ('group', groups))
+)
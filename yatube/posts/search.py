@@ -0,0 +1,293 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Индекс - отдельная таблица posts_search: виртуальная таблица FTS5 на
+SQLite и таблица с tsvector под GIN-индексом на PostgreSQL. Каждый пост
+и каждый комментарий - отдельный документ, результаты сводятся к постам.
+Индекс обновляют сигналы, команда rebuild_search_index строит его заново.
+"""
+import re
+
+from django.apps import apps as global_apps
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Comment, Post
+from .stemmer import WORD_RE, stem, stems
+from .utils import CursorPaginator, InvalidCursor
+
+TABLE = 'posts_search'
+POST, COMMENT = 0, 1
+# Совпадение в комментарии весит меньше совпадения в самом посте.
+COMMENT_WEIGHT: float = 0.5
+REBUILD_BATCH: int = 1000
+SNIPPET_WORDS: int = 30
+
+SCHEMA = {
+    'sqlite': [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+        'body, post_id UNINDEXED, '
+        "tokenize = 'unicode61 remove_diacritics 0')",
+    ],
+    'postgresql': [
+        f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+        'id bigint PRIMARY KEY, '
+        'post_id integer NOT NULL, '
+        'document tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {TABLE}_document '
+        f'ON {TABLE} USING GIN (document)',
+        f'CREATE INDEX IF NOT EXISTS {TABLE}_post_id ON {TABLE} (post_id)',
+    ],
+}
+
+# Поиск документов: параметры - запрос; столбцы - id, post_id, score.
+# Чем меньше score, тем выше документ в выдаче.
+MATCH = {
+    'sqlite': (
+        f'SELECT rowid AS id, post_id, rank * CASE WHEN rowid %% 2 '
+        f'THEN {COMMENT_WEIGHT} ELSE 1 END AS score '
+        f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+    ),
+    'postgresql': (
+        f'SELECT id, post_id, -ts_rank_cd(document, query) AS score '
+        f"FROM {TABLE}, plainto_tsquery('russian', %s) query "
+        f'WHERE document @@ query'
+    ),
+}
+
+
+def supported():
+    return connection.vendor in SCHEMA
+
+
+def _doc_id(kind, object_id):
+    """Номер документа; младший бит - тип, чтобы не заводить второй столбец."""
+    return object_id * 2 + kind
+
+
+def _query(text):
+    """Запрос в синтаксисе индекса; пустая строка - искать нечего."""
+    if connection.vendor == 'sqlite':
+        return ' '.join(f'"{word}"' for word in dict.fromkeys(stems(text)))
+    return text if WORD_RE.search(text) else ''
+
+
+def create_schema(schema_editor):
+    for statement in SCHEMA.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_schema(schema_editor):
+    if schema_editor.connection.vendor in SCHEMA:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+def _store(documents):
+    """Добавляет или заменяет документы (kind, object_id, post_id, text)."""
+    if not supported() or not documents:
+        return
+    if connection.vendor == 'sqlite':
+        sql = (
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, body, post_id) '
+            'VALUES (%s, %s, %s)'
+        )
+        params = [
+            (_doc_id(kind, pk), ' '.join(stems(text)), post_id)
+            for kind, pk, post_id, text in documents
+        ]
+    else:
+        sql = (
+            f'INSERT INTO {TABLE} (id, post_id, document) VALUES '
+            "(%s, %s, setweight(to_tsvector('russian', %s), %s)) "
+            'ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document'
+        )
+        params = [
+            (_doc_id(kind, pk), post_id, text, 'A' if kind == POST else 'C')
+            for kind, pk, post_id, text in documents
+        ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _id_column():
+    return 'rowid' if connection.vendor == 'sqlite' else 'id'
+
+
+def index_post(post):
+    _store([(POST, post.pk, post.pk, post.text)])
+
+
+def index_comment(comment):
+    _store([(COMMENT, comment.pk, comment.post_id, comment.text)])
+
+
+def _remove(kind, object_id):
+    """Удаляет документ по первичному ключу, без перебора индекса."""
+    if supported():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE {_id_column()} = %s',
+                [_doc_id(kind, object_id)],
+            )
+
+
+def remove_post(post_id):
+    _remove(POST, post_id)
+
+
+def remove_comment(comment_id):
+    _remove(COMMENT, comment_id)
+
+
+def remove_comments(post_id):
+    """Убирает документы всех комментариев поста одним запросом.
+
+    Столбец post_id в FTS5 не индексирован, поэтому номера документов
+    берутся из индекса комментариев по посту.
+    """
+    if supported():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE {_id_column()} IN ('
+                f'SELECT id * 2 + {COMMENT} FROM {Comment._meta.db_table} '
+                'WHERE post_id = %s)',
+                [post_id],
+            )
+
+
+def rebuild(apps=global_apps):
+    """Строит индекс заново; возвращает число документов."""
+    if not supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    total = 0
+    sources = (
+        (POST, apps.get_model('posts', 'Post'), 'id'),
+        (COMMENT, apps.get_model('posts', 'Comment'), 'post_id'),
+    )
+    for kind, model, post_field in sources:
+        rows = model.objects.order_by('pk').values_list(
+            'pk', post_field, 'text'
+        )
+        last = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last)[:REBUILD_BATCH])
+            if not batch:
+                break
+            _store([(kind, pk, post_id, text) for pk, post_id, text in batch])
+            total += len(batch)
+            last = batch[-1][0]
+    return total
+
+
+def matching_post_ids(text):
+    """Подзапрос с id постов, подходящих под запрос, для фильтров ORM."""
+    query = _query(text)
+    if not query:
+        return RawSQL('SELECT NULL WHERE 1 = 0', [])
+    return RawSQL(f'SELECT post_id FROM ({MATCH[connection.vendor]}) m',
+                  [query])
+
+
+def highlight(text, words, size=SNIPPET_WORDS):
+    """Фрагмент текста вокруг первого совпадения с подсвеченными словами.
+
+    Совпадением считается слово с той же основой, что и у слова запроса.
+    """
+    tokens = re.split(r'(\w+)', text)
+    positions = {
+        i for i in range(1, len(tokens), 2) if stem(tokens[i]) in words
+    }
+    first = min(positions, default=1)
+    start = max(1, first - size // 2 * 2)
+    end = min(len(tokens), start + size * 2)
+    parts = ['…'] if start > 1 else []
+    for i in range(start, end):
+        token = escape(tokens[i])
+        parts.append(f'<mark>{token}</mark>' if i in positions else token)
+    if end < len(tokens) - 1:
+        parts.append('…')
+    return mark_safe(''.join(parts).strip())
+
+
+class SearchPaginator(CursorPaginator):
+    """Постраничная выдача поиска по ключу (score, id поста).
+
+    Посты упорядочены по лучшему из рангов своих документов - текста
+    поста и комментариев; страницы выбираются так же, как в лентах,
+    условием по ключу последней показанной записи.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__([], per_page, ordering=('score', '-post_id'))
+        self.query = query
+        self.words = set(stems(query))
+
+    def _keys(self, post):
+        return [post.search_score, post.pk]
+
+    def _fetch(self, values, reverse, limit):
+        query = _query(self.query)
+        if not supported() or not query:
+            return []
+        condition, params = '', [query]
+        if values is not None:
+            try:
+                score, post_id = float(values[0]), int(values[1])
+            except (TypeError, ValueError):
+                raise InvalidCursor(values)
+            condition = (
+                'WHERE score < %s OR (score = %s AND post_id > %s)'
+                if reverse else
+                'WHERE score > %s OR (score = %s AND post_id < %s)'
+            )
+            params += [score, score, post_id]
+        direction = 'DESC, post_id' if reverse else ', post_id DESC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id, score FROM ('
+                f'SELECT post_id, MIN(score) AS score '
+                f'FROM ({MATCH[connection.vendor]}) m GROUP BY post_id'
+                f') ranked {condition} '
+                f'ORDER BY score {direction} LIMIT %s',
+                params + [limit],
+            )
+            ranked = cursor.fetchall()
+        posts = Post.objects.feed().in_bulk([pk for pk, _ in ranked])
+        rows = []
+        for pk, score in ranked:
+            if pk in posts:
+                posts[pk].search_score = score
+                rows.append(posts[pk])
+        self._add_snippets(rows[:self.per_page], query)
+        return rows
+
+    def _add_snippets(self, posts, query):
+        """Подсвеченные фрагменты для выдачи.
+
+        Если слова запроса нашлись только в комментариях, фрагмент
+        берётся из первого подходящего комментария.
+        """
+        texts = {}
+        missing = [
+            post.pk for post in posts
+            if not self.words.intersection(stems(post.text))
+        ]
+        if missing:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT id FROM ({MATCH[connection.vendor]}) m '
+                    f'WHERE post_id IN ({", ".join(["%s"] * len(missing))}) '
+                    f'AND id %% 2 = {COMMENT}',
+                    [query, *missing],
+                )
+                comment_ids = [doc_id // 2 for doc_id, in cursor.fetchall()]
+            for post_id, text in Comment.objects.filter(
+                pk__in=comment_ids
+            ).order_by('-pk').values_list('post_id', 'text'):
+                texts[post_id] = text
+        for post in posts:
+            post.snippet = highlight(texts.get(post.pk, post.text), self.words)
+            post.snippet_from_comment = post.pk in texts
@@ -0,0 +1,229 @@
+from django.db import DatabaseError
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import objects, search, thumbnails, timeline
+from .caching import author_scope, bump, bump_post, post_scopes
+from .counters import add
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance.previous_group_id, instance.previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, '')
+        )
+
+
+@receiver(pre_save, sender=Post)
+def reset_thumbnails(sender, instance, **kwargs):
+    if instance.image.name != getattr(instance, 'previous_image', ''):
+        instance.thumbnails = '{}'
+
+
+@receiver(post_save, sender=Post)
+def generate_thumbnails(sender, instance, **kwargs):
+    if instance.image and instance.thumbnails == '{}':
+        thumbnails.schedule(instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out_post.delay(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        add(Profile, instance.author_id, post_count=1)
+        add(Group, instance.group_id, post_count=1)
+        return
+    previous_group_id = getattr(instance, 'previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        add(Group, previous_group_id, post_count=-1)
+        add(Group, instance.group_id, post_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    add(Profile, instance.author_id, post_count=-1)
+    add(Group, instance.group_id, post_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        add(Post, instance.post_id, comment_count=1)
+
+
+def _with_post(instance):
+    """Комментарий удаляется вместе с постом через Post.delete()."""
+    return instance.post_id in Post.deleting_ids()
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if not _with_post(instance):
+        add(Post, instance.post_id, comment_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.fill.delay(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        add(Profile, instance.author_id, follower_count=1)
+        add(Profile, instance.user_id, following_count=1)
+        timeline.follower_count_changed(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline(sender, instance, **kwargs):
+    timeline.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    add(Profile, instance.author_id, follower_count=-1)
+    add(Profile, instance.user_id, following_count=-1)
+    timeline.follower_count_changed(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def unindex_post_comments(sender, instance, **kwargs):
+    # Пока комментарии ещё в базе: по ним находятся их документы.
+    search.remove_comments(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    if not _with_post(instance):
+        search.remove_comment(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    bump(*post_scopes(
+        instance.pk,
+        instance.author_id,
+        instance.group_id,
+        getattr(instance, 'previous_group_id', None),
+    ))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_pages(sender, instance, **kwargs):
+    bump(*post_scopes(instance.pk, instance.author_id, instance.group_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    if not _with_post(instance):
+        bump_post(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    bump(author_scope(instance.author_id), f'follows:{instance.user_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    bump('groups')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_pages(sender, instance, **kwargs):
+    # Новый пользователь и обновление last_login при входе страниц не меняют.
+    if kwargs.get('created'):
+        return
+    if kwargs.get('update_fields') != frozenset(['last_login']):
+        bump('users')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def forget_post(sender, instance, **kwargs):
+    # Вместе с постом меняются счётчики в профиле автора и в группах.
+    objects.posts.forget(instance.pk)
+    objects.users.forget(instance.author_id)
+    objects.groups.forget(
+        instance.group_id, getattr(instance, 'previous_group_id', None)
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def forget_commented_post(sender, instance, **kwargs):
+    if not _with_post(instance):
+        objects.posts.forget(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_follow_users(sender, instance, **kwargs):
+    objects.users.forget(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_group(sender, instance, **kwargs):
+    objects.groups.forget(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    objects.users.forget(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def forget_profile_user(sender, instance, **kwargs):
+    objects.users.forget(instance.user_id)
+
+
+@receiver(post_migrate)
+def forget_cached_objects(sender, **kwargs):
+    # После миграций (и после flush в тестах) закэшированные объекты могут
+    # не совпадать ни со схемой, ни с данными в базе.
+    if sender.name != 'posts':
+        return
+    try:
+        objects.bump_version()
+    except DatabaseError:
+        # Таблица кэша db:// ещё не создана - в ней и сбрасывать нечего.
+        pass
@@ -0,0 +1,128 @@
+"""Стеммер Snowball для русского языка.
+
+Нужен для поиска на SQLite: FTS5 не умеет русскую морфологию, поэтому
+в индекс и в запрос попадают уже приведённые к основе слова.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _regions(word):
+    """Начала областей RV и R2 по правилам Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _cut(rv, endings, preceded=False):
+    """Отрезает самое длинное окончание; preceded - только после а/я."""
+    for ending in sorted(endings, key=len, reverse=True):
+        if not rv.endswith(ending):
+            continue
+        stem = rv[:-len(ending)]
+        if preceded and not stem.endswith(('а', 'я')):
+            continue
+        return stem
+    return None
+
+
+def _cut_groups(rv, groups):
+    first, second = groups
+    candidates = [
+        stem for stem in (
+            _cut(rv, first, preceded=True), _cut(rv, second)
+        ) if stem is not None
+    ]
+    return min(candidates, key=len) if candidates else None
+
+
+def _step1(rv):
+    cut = _cut_groups(rv, PERFECTIVE_GERUND)
+    if cut is not None:
+        return cut
+    if rv.endswith(REFLEXIVE):
+        rv = _cut(rv, REFLEXIVE)
+    adjective = _cut(rv, ADJECTIVE)
+    if adjective is not None:
+        participle = _cut_groups(adjective, PARTICIPLE)
+        return adjective if participle is None else participle
+    cut = _cut_groups(rv, VERB)
+    if cut is None:
+        cut = _cut(rv, NOUN)
+    return rv if cut is None else cut
+
+
+def _step4(rv):
+    if rv.endswith('нн'):
+        return rv[:-1]
+    superlative = _cut(rv, SUPERLATIVE)
+    if superlative is not None:
+        return superlative[:-1] if superlative.endswith('нн') else superlative
+    return rv[:-1] if rv.endswith('ь') else rv
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+    rv = _step1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    # Словообразовательные окончания отрезаются только в области R2.
+    r2 = rv[max(r2_start - rv_start, 0):]
+    derivational = _cut(r2, DERIVATIONAL)
+    if derivational is not None:
+        rv = rv[:len(rv) - len(r2) + len(derivational)]
+    return prefix + _step4(rv)
+
+
+def stems(text):
+    return [stem(word) for word in WORD_RE.findall(text)]
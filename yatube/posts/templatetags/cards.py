@@ -0,0 +1,11 @@
+from django import template
+
+from ..fragments import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, show_author=True, show_group=True):
+    """Карточки постов из кэша фрагментов: пары (пост, HTML)."""
+    return render_cards(posts, show_author, show_group)
@@ -0,0 +1,13 @@
+from django import template
+
+from ..utils import CursorPaginator, page_window as window
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj, on_each_side=2, on_ends=1):
+    """Окно номеров страниц; для ленты с курсорами номера не показываются."""
+    if isinstance(page_obj.paginator, CursorPaginator):
+        return []
+    return window(page_obj, on_each_side, on_ends)
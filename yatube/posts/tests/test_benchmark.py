@@ -0,0 +1,52 @@
+import os
+
+from django.conf import settings
+from django.test import TestCase
+from posts import benchmark
+
+BASELINE = os.path.join(settings.BASE_DIR, 'posts', 'benchmarks.json')
+
+
+class BenchmarkTests(TestCase):
+    """Число запросов страниц не растёт выше базовой линии.
+
+    Данных здесь немного: запросы от объёма зависеть не должны, а время
+    и память сравнивает команда benchmark на полном объёме.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed(
+            users=30, posts=300, follows=5, comments=150, groups=3
+        )
+
+    def test_pages_stay_within_baseline_queries(self):
+        results = benchmark.run(repeat=1)
+        self.assertEqual(benchmark.uncovered(results), [])
+        baseline = benchmark.load_baseline(BASELINE)
+        for name, result in results.items():
+            for metric in ('queries', 'warm_queries'):
+                with self.subTest(page=name, metric=metric):
+                    self.assertLessEqual(
+                        result[metric], baseline[name][metric]
+                    )
+
+    def test_compare_reports_regressions(self):
+        base = {
+            'queries': 3, 'warm_queries': 0, 'p99': 10.0, 'warm_p99': 1.0,
+            'memory': 100,
+        }
+        slow = dict(base, warm_queries=1, p99=40.0, warm_p99=9.0)
+        self.assertEqual(
+            benchmark.compare({'index': slow}, {'index': base}),
+            [
+                'index: warm_queries 1 > 0',
+                'index: p99 40.0 > 15.0',
+                'index: warm_p99 9.0 > 6.0',
+            ],
+        )
+        self.assertEqual(
+            benchmark.compare({'index': dict(base, memory=300)},
+                              {'index': base}),
+            [],
+        )
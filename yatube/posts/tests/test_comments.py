@@ -0,0 +1,125 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Post, User
+
+
+@override_settings(COMMENTS_FIRST_PAGE=2, COMMENTS_PAGE_SIZE=3)
+class CommentPagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        for number in range(6):
+            Comment.objects.create(
+                author=User.objects.create_user(username=f'reader{number}'),
+                post=self.post,
+                text=f'Комментарий {number}',
+            )
+        self.url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_first_page_has_configured_size(self):
+        comments = self.client.get(self.url).context['comments']
+        self.assertEqual(
+            self.texts(comments), ['Комментарий 0', 'Комментарий 1']
+        )
+        self.assertTrue(comments.has_next)
+
+    def test_next_batches_are_fragments(self):
+        comments = self.client.get(self.url).context['comments']
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        response = self.client.get(url, {'cursor': comments.next_cursor})
+        batch = response.context['comments']
+        self.assertEqual(
+            self.texts(batch),
+            ['Комментарий 2', 'Комментарий 3', 'Комментарий 4'],
+        )
+        self.assertNotContains(response, '<html')
+        last = self.client.get(url, {'cursor': batch.next_cursor})
+        self.assertEqual(
+            self.texts(last.context['comments']), ['Комментарий 5']
+        )
+        self.assertNotContains(last, 'Показать ещё')
+
+    def test_authors_are_not_queried_per_comment(self):
+        for size in (2, 6):
+            cache.clear()
+            with self.subTest(size=size), self.settings(
+                COMMENTS_FIRST_PAGE=size
+            ):
+                # Автор поста, сам пост и порция комментариев с авторами.
+                with self.assertNumQueries(3):
+                    self.client.get(self.url)
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.first = self.reply('Первый')
+        self.second = self.reply('Второй')
+        self.answer = self.reply('Ответ', self.first)
+        self.deep = self.reply('Ответ на ответ', self.answer)
+        self.url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def reply(self, text, parent=None):
+        return Comment.objects.create(
+            author=self.user, post=self.post, parent=parent, text=text
+        )
+
+    def texts(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    def test_threads_are_read_in_tree_order(self):
+        self.assertEqual(
+            self.texts(self.client.get(self.url)),
+            ['Первый', 'Ответ', 'Ответ на ответ', 'Второй'],
+        )
+        self.assertEqual(
+            [self.answer.depth, self.deep.depth, self.second.depth], [1, 2, 0]
+        )
+        self.assertTrue(self.deep.path.startswith(self.answer.path + '.'))
+
+    @override_settings(COMMENTS_FIRST_PAGE=2, COMMENTS_PAGE_SIZE=2)
+    def test_thread_is_paginated_separately(self):
+        response = self.client.get(self.url, {'thread': self.first.pk})
+        self.assertEqual(self.texts(response), ['Первый', 'Ответ'])
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        response = self.client.get(url, {
+            'cursor': response.context['comments'].next_cursor,
+            'thread': self.first.pk,
+        })
+        self.assertEqual(self.texts(response), ['Ответ на ответ'])
+
+    @override_settings(COMMENTS_MAX_DEPTH=2)
+    def test_replies_below_max_depth_go_to_ancestor(self):
+        reply = self.reply('Слишком глубоко', self.deep)
+        self.assertEqual((reply.parent, reply.depth), (self.answer, 2))
+
+    def test_replies_are_posted_to_own_post_only(self):
+        other = Post.objects.create(author=self.user, text='Другой')
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, {'reply': self.second.pk})
+        self.assertContains(response, f'value="{self.second.pk}"')
+        self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Ответ второму', 'parent': self.second.pk},
+        )
+        self.assertEqual(
+            Comment.objects.get(text='Ответ второму').parent, self.second
+        )
+        self.client.post(
+            reverse('posts:add_comment', args=(other.pk,)),
+            {'text': 'Чужой ответ', 'parent': self.first.pk},
+        )
+        self.assertFalse(Comment.objects.filter(text='Чужой ответ').exists())
+
+    def test_failed_path_update_rolls_back_insert(self):
+        self.first.path = None
+        with self.assertRaises(TypeError):
+            self.reply('Без пути', self.first)
+        self.assertFalse(Comment.objects.filter(text='Без пути').exists())
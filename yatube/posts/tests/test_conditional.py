@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Group, Post, User
+
+
+class ConditionalPagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Пост'
+        )
+        self.pages = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list', args=('group',)),
+            'profile': reverse('posts:profile', args=('Author',)),
+            'post_detail': reverse(
+                'posts:post_detail', args=(self.post.pk,)
+            ),
+        }
+
+    def test_unchanged_pages_return_304_without_queries(self):
+        for name, url in self.pages.items():
+            with self.subTest(page=name):
+                response = self.client.get(url)
+                self.assertIn('no-cache', response['Cache-Control'])
+                with self.assertNumQueries(0):
+                    etag = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                    modified = self.client.get(
+                        url,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                    )
+                self.assertEqual(etag.status_code, 304)
+                self.assertEqual(modified.status_code, 304)
+
+    def test_changes_invalidate_pages(self):
+        etags = {
+            name: self.client.get(url)['ETag']
+            for name, url in self.pages.items()
+        }
+        Comment.objects.create(author=self.user, post=self.post, text='Да')
+        for name, url in self.pages.items():
+            with self.subTest(page=name):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[name])
+                self.assertEqual(response.status_code, 200)
+
+    def test_user_pages_have_own_etag(self):
+        url = self.pages['index']
+        anonymous = self.client.get(url)
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('private', response['Cache-Control'])
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_fresh_changes_are_not_cached_from_replica(self):
+        url = self.pages['index']
+        response = self.client.get(url)
+        self.assertNotIn('ETag', response)
+        Post.objects.create(author=self.user, text='Новый')
+        self.assertContains(self.client.get(url), 'Новый')
+        with self.settings(DATABASE_REPLICA_LAG=0):
+            self.assertIn('ETag', self.client.get(url))
@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from posts import objects
+from posts.models import Comment, Follow, Group, Post, Profile, User
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            description='Test', slug='first', title='First'
+        )
+        cls.other_group = Group.objects.create(
+            description='Test', slug='second', title='Second'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCounts(self, obj, **counts):
+        obj.refresh_from_db()
+        for field, value in counts.items():
+            with self.subTest(obj=obj, field=field):
+                self.assertEqual(getattr(obj, field), value)
+
+    def test_post_counters(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Post'
+        )
+        self.assertCounts(self.author.profile, post_count=1)
+        self.assertCounts(self.group, post_count=1)
+        post.group = self.other_group
+        post.save()
+        self.assertCounts(self.group, post_count=0)
+        self.assertCounts(self.other_group, post_count=1)
+        post.delete()
+        self.assertCounts(self.author.profile, post_count=0)
+        self.assertCounts(self.other_group, post_count=0)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(author=self.author, text='Post')
+        comment = Comment.objects.create(
+            author=self.reader, post=post, text='Comment'
+        )
+        self.assertCounts(post, comment_count=1)
+        comment.delete()
+        self.assertCounts(post, comment_count=0)
+
+    def test_saves_keep_counters_moved_meanwhile(self):
+        group = Group.objects.get(pk=self.group.pk)
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Post'
+        )
+        Comment.objects.create(author=self.reader, post=post, text='Comment')
+        post.text = 'Edited'
+        post.save()
+        group.title = 'Renamed'
+        group.save()
+        self.assertCounts(post, comment_count=1, text='Edited')
+        self.assertCounts(group, post_count=1, title='Renamed')
+
+    def test_group_edit_keeps_repaired_counter(self):
+        objects.groups.get_or_404(self.group.slug)
+        Group.objects.filter(pk=self.group.pk).update(post_count=3)
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('posts:group_edit', args=(self.group.slug,)),
+            {'title': 'Renamed', 'slug': 'first', 'description': 'Test'},
+        )
+        self.assertCounts(self.group, post_count=3, title='Renamed')
+
+    def test_follow_counters(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounts(self.author.profile, follower_count=1)
+        self.assertCounts(self.reader.profile, following_count=1)
+        follow.delete()
+        self.assertCounts(self.author.profile, follower_count=0)
+        self.assertCounts(self.reader.profile, following_count=0)
+
+    def test_recount_repairs_drift(self):
+        Post.objects.create(author=self.author, group=self.group, text='Post')
+        Profile.objects.filter(user=self.author).update(post_count=7)
+        Profile.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('Profile.post_count: исправлено строк 1', out.getvalue())
+        self.assertCounts(self.author.profile, post_count=1)
+        self.assertTrue(Profile.objects.filter(user=self.reader).exists())
@@ -1,10 +1,12 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 from posts.forms import PostForm
 from posts.models import Post, User
 
@@ -127,3 +129,38 @@ class PostFormTests(TestCase):
             Post.objects.get(id=self.post.id).image
         ),
         self.assertEqual(Post.objects.count(), posts_count)
+
+    def image_upload(self, size, exif=None):
+        buffer = BytesIO()
+        image = Image.new('RGB', size)
+        image.save(buffer, 'JPEG', exif=exif or Image.Exif())
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue())
+
+    def test_image_is_cleaned_before_saving(self):
+        """EXIF вырезается, слишком большая картинка уменьшается."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        form = PostForm(
+            data={'text': 'text'},
+            files={'image': self.image_upload((300, 100), exif)},
+        )
+        with self.settings(POST_IMAGE_MAX_SIDE=150):
+            self.assertTrue(form.is_valid())
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.size, (150, 50))
+            self.assertFalse(image.getexif())
+
+    def test_oversized_image_is_rejected(self):
+        for setting, value in (
+            ('POST_IMAGE_MAX_BYTES', 100),
+            ('POST_IMAGE_MAX_PIXELS', 100),
+        ):
+            with self.subTest(setting=setting), self.settings(
+                **{setting: value}
+            ):
+                form = PostForm(
+                    data={'text': 'text'},
+                    files={'image': self.image_upload((20, 20))},
+                )
+                self.assertFalse(form.is_valid())
+                self.assertIn('image', form.errors)
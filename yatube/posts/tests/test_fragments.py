@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.test import TestCase
+from posts import fragments
+from posts.models import Comment, Group, Post, User
+
+
+class CardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='Author', first_name='Имя'
+        )
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for number in range(3):
+            Post.objects.create(
+                author=self.user, group=group, text=f'Пост {number}'
+            )
+
+    def cards(self, **flags):
+        return fragments.render_cards(Post.objects.feed(), **flags)
+
+    def test_key_covers_included_templates(self):
+        sources = list(fragments._sources(fragments.CARD_TEMPLATE, set()))
+        self.assertIn(
+            get_template('posts/includes/image.html').template.source,
+            sources,
+        )
+
+    def test_page_is_one_cache_round_trip(self):
+        self.cards()
+        before = fragments.metrics.metrics.copy()
+        calls = []
+        get_many = cache.get_many
+        cache.get_many = lambda keys: calls.append(keys) or get_many(keys)
+        try:
+            cards = self.cards()
+        finally:
+            del cache.get_many
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(fragments.metrics.metrics - before, {'hits': 3})
+        self.assertIn('Пост 2', cards[0][1])
+        self.assertIn('Группа', cards[0][1])
+
+    def test_changed_post_gets_new_card(self):
+        self.cards()
+        post = Post.objects.order_by('pk').first()
+        Comment.objects.create(author=self.user, post=post, text='Да')
+        self.user.first_name = 'Другое'
+        self.user.save()
+        cards = dict(self.cards())
+        self.assertIn('Комментариев: 1', cards[post])
+        self.assertIn('Другое', cards[post])
+
+    def test_variants_are_cached_separately(self):
+        self.cards()
+        card = self.cards(show_author=False, show_group=False)[0][1]
+        self.assertNotIn('Автор', card)
+        self.assertNotIn('Группа', card)
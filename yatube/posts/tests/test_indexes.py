@@ -0,0 +1,100 @@
+from unittest import skipUnless
+
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import CursorPaginator
+
+
+def index_name(model, fields):
+    for index in model._meta.indexes:
+        if index.fields == fields:
+            return index.name
+    raise LookupError(fields)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы запросов SQLite')
+class QueryPlanTests(TestCase):
+    """Ленты и комментарии читаются по индексу, без сортировки в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        Comment.objects.create(author=cls.author, post=cls.post, text='К')
+
+    def assertUsesIndex(self, queryset, model, fields):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name(model, fields)}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_use_composite_indexes(self):
+        ordering = ('-pub_date', '-id')
+        cases = (
+            (Post.objects.feed(), ['-pub_date', '-id']),
+            (self.author.posts.feed(), ['author', '-pub_date', '-id']),
+            (self.group.posts.feed(), ['group', '-pub_date', '-id']),
+        )
+        for queryset, fields in cases:
+            with self.subTest(fields=fields):
+                self.assertUsesIndex(
+                    queryset.order_by(*ordering)[:11], Post, fields
+                )
+
+    def test_cursor_page_uses_index(self):
+        posts = self.author.posts.all()
+        seek = CursorPaginator(posts, 10)._seek(
+            [self.post.pub_date.isoformat(), self.post.pk], False
+        )
+        self.assertUsesIndex(
+            posts.filter(seek).order_by('-pub_date', '-id')[:11],
+            Post,
+            ['author', '-pub_date', '-id'],
+        )
+
+    def test_comments_use_index(self):
+        self.assertUsesIndex(
+            self.post.comments.order_by('created', 'id'),
+            Comment,
+            ['post', 'created', 'id'],
+        )
+
+    def test_comment_thread_is_one_index_range(self):
+        comment = self.post.comments.get()
+        self.assertUsesIndex(
+            self.post.comments.subtree(comment).order_by('path'),
+            Comment,
+            ['post', 'path'],
+        )
+
+
+class FollowConstraintTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+
+    def test_follow_is_unique_and_not_self(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        for author in (self.author, self.user):
+            with self.subTest(author=author), transaction.atomic():
+                with self.assertRaises(IntegrityError):
+                    Follow.objects.create(user=self.user, author=author)
+
+    def test_repeated_follow_is_single_insert(self):
+        self.client.force_login(self.user)
+        url = reverse('posts:profile_follow', args=(self.author.username,))
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=self.author).count(),
+            1,
+        )
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.follower_count, 1)
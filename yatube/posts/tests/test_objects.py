@@ -0,0 +1,98 @@
+from django.apps import apps
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+from posts import objects, signals
+from posts.models import Comment, Group, Post, User
+
+
+class ObjectCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Пост'
+        )
+
+    def test_cached_post_comes_with_author_and_group(self):
+        objects.posts.get(self.post.pk)
+        with self.assertNumQueries(0):
+            post = objects.posts.get(self.post.pk)
+            self.assertEqual(post.author.username, 'Author')
+            self.assertEqual(post.author.profile.post_count, 1)
+            self.assertEqual(post.group.slug, 'group')
+            self.assertEqual(objects.users.get_by('Author'), self.user)
+            self.assertEqual(objects.groups.get_by('group'), self.group)
+
+    def test_missing_objects(self):
+        self.assertIsNone(objects.posts.get(0))
+        with self.assertRaises(Http404):
+            objects.users.get_or_404('nobody')
+
+    def test_changes_invalidate_cache(self):
+        objects.posts.get(self.post.pk)
+        self.group.refresh_from_db()
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertIsNone(objects.groups.get_by('group'))
+        self.assertEqual(objects.groups.get_by('renamed'), self.group)
+        Comment.objects.create(author=self.user, post=self.post, text='Да')
+        Post.objects.create(author=self.user, group=self.group, text='Ещё')
+        post = objects.posts.get(self.post.pk)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.group.slug, 'renamed')
+        self.assertEqual(post.group.post_count, 2)
+        self.assertEqual(post.author.profile.post_count, 2)
+
+    def test_list_is_hydrated_in_one_cache_call(self):
+        other = User.objects.create_user(username='Other')
+        Post.objects.create(author=other, text='Без группы')
+        listed = list(Post.objects.order_by('pk'))
+        objects.hydrate(listed, author=objects.users, group=objects.groups)
+        listed = list(Post.objects.order_by('pk'))
+        calls = []
+        get_many = cache.get_many
+        cache.get_many = lambda keys: calls.append(keys) or get_many(keys)
+        try:
+            with self.assertNumQueries(0):
+                objects.hydrate(
+                    listed, author=objects.users, group=objects.groups
+                )
+                self.assertEqual(
+                    [post.author.username for post in listed],
+                    ['Author', 'Other'],
+                )
+                self.assertIsNone(listed[1].group)
+        finally:
+            del cache.get_many
+        self.assertEqual(len(calls), 1)
+
+    def test_hit_ratio_metrics(self):
+        before = objects.posts.metrics.copy()
+        objects.posts.get(self.post.pk)
+        objects.posts.get(self.post.pk)
+        self.assertEqual(
+            objects.posts.metrics - before, {'hits': 1, 'misses': 1}
+        )
+        objects.posts.flush_metrics()
+        self.assertIn('hits', objects.posts.shared_metrics())
+
+    def test_migrations_forget_only_objects(self):
+        objects.posts.get(self.post.pk)
+        cache.set('unrelated', 'kept')
+        signals.forget_cached_objects(sender=apps.get_app_config('posts'))
+        with self.assertNumQueries(1):
+            objects.posts.get(self.post.pk)
+        self.assertEqual(cache.get('unrelated'), 'kept')
+
+    def test_account_fields_are_not_cached(self):
+        objects.posts.get(self.post.pk)
+        for user in (
+            cache.get(objects.users.key(self.user.pk)),
+            objects.users.get_by('Author'),
+        ):
+            self.assertNotIn('password', user.__dict__)
+            self.assertNotIn('email', user.__dict__)
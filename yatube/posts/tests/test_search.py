@@ -0,0 +1,117 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import search
+from posts.models import Comment, Post, User
+from posts.stemmer import stem
+from posts.utils import encode_cursor
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        for forms in (
+            ('пост', 'постов', 'постами', 'посте'),
+            ('красивый', 'красивые', 'красивого'),
+            ('читали', 'читать', 'читает'),
+            ('ёлка', 'елки', 'ёлкой'),
+        ):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Searcher')
+        self.cats = Post.objects.create(
+            author=self.user, text='Рассказ о котах и их привычках'
+        )
+        self.dogs = Post.objects.create(
+            author=self.user, text='Собаки любят долгие прогулки'
+        )
+        Comment.objects.create(
+            author=self.user, post=self.dogs, text='А мои коты гуляют сами'
+        )
+
+    def results(self, query, cursor=None):
+        return search.SearchPaginator(query, 10).get_page(cursor)
+
+    def test_matches_word_forms_in_posts_and_comments(self):
+        page = self.results('кот')
+        self.assertEqual(list(page), [self.cats, self.dogs])
+        self.assertIn('<mark>котах</mark>', page[0].snippet)
+        self.assertTrue(page[1].snippet_from_comment)
+        self.assertIn('<mark>коты</mark>', page[1].snippet)
+
+    def test_index_follows_edits_and_deletes(self):
+        self.cats.text = 'Теперь о птицах'
+        self.cats.save()
+        self.assertEqual(list(self.results('коты')), [self.dogs])
+        self.assertEqual(list(self.results('птица')), [self.cats])
+        self.dogs.comments.all().delete()
+        self.assertEqual(list(self.results('коты')), [])
+        self.dogs.delete()
+        self.assertEqual(list(self.results('прогулка')), [])
+
+    def test_deleted_post_takes_comment_documents_along(self):
+        self.dogs.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_post_delete_does_no_work_per_comment(self):
+        def delete_queries(comments):
+            post = Post.objects.create(author=self.user, text='Пост')
+            Comment.objects.bulk_create(
+                Comment(author=self.user, post=post, text='Комментарий')
+                for _ in range(comments)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+
+        self.assertEqual(delete_queries(2), delete_queries(20))
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        for values in (['nope', 1], [{'a': 1}, 1], [0.5, 'abc']):
+            with self.subTest(values=values):
+                page = self.results('кот', encode_cursor(values, 2))
+                self.assertEqual(list(page), [self.cats, self.dogs])
+
+    def test_cursor_pagination(self):
+        for number in range(5):
+            Post.objects.create(author=self.user, text=f'Море {number}')
+        paginator = search.SearchPaginator('море', 2)
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        seen = [*first, *second, *third]
+        self.assertEqual(len(set(seen)), 5)
+        self.assertFalse(third.has_next())
+        self.assertEqual(
+            list(paginator.get_page(second.previous_cursor)), list(first)
+        )
+
+    def test_search_page_and_admin(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'собака'})
+        self.assertEqual(list(response.context['page_obj']), [self.dogs])
+        self.assertContains(response, '<mark>Собаки</mark>')
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котов'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].queryset), [self.cats]
+        )
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('документов: 3', out.getvalue())
+        self.assertEqual(len(self.results('кот')), 2)
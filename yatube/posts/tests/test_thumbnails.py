@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts import thumbnails
+from sorl.thumbnail import get_thumbnail
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Photographer')
+        self.post = Post.objects.create(
+            author=self.user,
+            text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_pages_use_original_until_thumbnails_are_ready(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        self.post.refresh_from_db()
+        card = self.post.thumbnail_set['card']
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, card['url'])
+        self.assertTrue(card['url'].startswith(settings.MEDIA_URL + 'cache/'))
+
+    def test_srcset_covers_widths_and_formats(self):
+        buffer = BytesIO()
+        Image.new('RGB', (2000, 1000)).save(buffer, 'PNG')
+        self.post.image = SimpleUploadedFile('big.png', buffer.getvalue())
+        self.post.save()
+        card = thumbnails.generate(self.post.pk, self.post.image.name)['card']
+        self.assertEqual((card['width'], card['height']), (1440, 560))
+        self.assertEqual(
+            [source['type'] for source in card['sources']],
+            [f'image/{format_.lower()}' for format_ in thumbnails.formats()],
+        )
+        self.assertTrue(card['sources'][-1]['srcset'].endswith('1440w'))
+        self.assertEqual(card['sources'][-1]['srcset'].count('w, '), 2)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertContains(response, 'sizes="(min-width: 768px) 75vw')
+
+    @override_settings(POST_THUMBNAIL_FORMATS=('UNKNOWN',))
+    def test_unsupported_formats_fall_back_to_jpeg(self):
+        card = thumbnails.render(self.post.image.name)['card']
+        self.assertEqual(
+            [source['type'] for source in card['sources']], ['image/jpeg']
+        )
+        self.assertTrue(card['url'].endswith('.jpg'))
+
+    def test_new_image_resets_thumbnails(self):
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        self.post.refresh_from_db()
+        self.post.text = 'Другой текст'
+        self.post.save()
+        self.assertIn('card', self.post.thumbnail_set)
+        self.post.image = SimpleUploadedFile('other.gif', SMALL_GIF)
+        self.post.save()
+        self.assertEqual(self.post.thumbnail_set, {})
+
+    def test_stale_result_is_not_saved(self):
+        name = self.post.image.name
+        Post.objects.filter(pk=self.post.pk).update(image='posts/new.gif')
+        thumbnails.generate(self.post.pk, name)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_set, {})
+
+    def test_maintain_thumbnails_command(self):
+        old = time.time() - thumbnails.ORPHAN_MIN_AGE - 1
+        orphan = default_storage.save(
+            'posts/orphan.gif', ContentFile(SMALL_GIF)
+        )
+        orphan_thumbnail = get_thumbnail(orphan, '10x10').name
+        for name in (orphan, orphan_thumbnail):
+            os.utime(default_storage.path(name), (old, old))
+        out = StringIO()
+        call_command(
+            'maintain_thumbnails', '--workers=0', stdout=out, stderr=StringIO()
+        )
+        self.assertIn('создано для 1 постов, с ошибками 0', out.getvalue())
+        self.assertIn('удалено 2', out.getvalue())
+        self.assertIn('удалено записей 2', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertIn('card', self.post.thumbnail_set)
+        self.assertTrue(default_storage.exists(self.post.image.name))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(orphan_thumbnail))
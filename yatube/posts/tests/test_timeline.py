@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from jobs import worker
+from jobs.models import Job
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.old_post = Post.objects.create(author=cls.author, text='Old')
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self):
+        return list(timeline.followed_posts(self.reader).order_by('-id'))
+
+    def test_follow_fills_and_unfollow_clears_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        worker.run_pending()
+        self.assertEqual(self.feed(), [self.old_post])
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_fans_out_and_delete_propagates(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='New')
+        worker.run_pending()
+        self.assertEqual(self.feed(), [post, self.old_post])
+        post.delete()
+        self.assertEqual(self.feed(), [self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_read_on_fan_in(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='New')
+        worker.run_pending()
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_rebuild_command_repairs_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_timelines', 'Reader', stdout=out)
+        self.assertIn('записей: 1', out.getvalue())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_pages_merge_timeline_and_celebrity_posts(self):
+        celebrity = User.objects.create_user(username='Celebrity')
+        fan = User.objects.create_user(username='Fan')
+        Follow.objects.create(user=fan, author=celebrity)
+        Follow.objects.create(user=self.reader, author=celebrity)
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Автор {number}')
+            Post.objects.create(author=celebrity, text=f'Звезда {number}')
+        worker.run_pending()
+        cache.clear()
+        expected = self.feed()
+        self.assertEqual(len(expected), 7)
+        paginator = timeline.TimelinePaginator(self.reader, 3)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual(
+            [post for page in pages for post in page], expected
+        )
+        previous = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual(list(previous), list(pages[-2]))
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_demoted_celebrity_is_backfilled_once(self):
+        fan = User.objects.create_user(username='Fan')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=fan, author=self.author)
+        worker.run_pending()
+        TimelineEntry.objects.all().delete()
+        for _ in range(2):
+            cache.clear()
+            self.assertEqual(self.feed(), [self.old_post])
+        self.assertFalse(Job.objects.exists())
+        Follow.objects.filter(user=fan).delete()
+        self.assertEqual(
+            list(Job.objects.values_list('name', flat=True)),
+            ['posts.timeline.fan_out_author'],
+        )
+        worker.run_pending()
+        self.assertTrue(TimelineEntry.objects.filter(post=self.old_post))
@@ -3,6 +3,7 @@ from http import HTTPStatus
 from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
+from jobs import worker
 from posts.models import Follow, Group, Post, User
 
 
@@ -92,12 +93,12 @@ class PostURLTests(TestCase):
         )
         cache.clear()
         response = self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(reverse('posts:index'))
         post_to_delete.delete()
-        cached_response = self.client.get(reverse('posts:index'))
-        cache.clear()
-        cache_cleared_response = self.client.get(reverse('posts:index'))
+        invalidated_response = self.client.get(reverse('posts:index'))
         self.assertEqual(response.content, cached_response.content)
-        self.assertNotEqual(response.content, cache_cleared_response.content)
+        self.assertNotEqual(response.content, invalidated_response.content)
 
     def test_new_post_followed_author_on_follow_page(self):
         """Пост появляется в ленте у пользователя,
@@ -111,6 +112,7 @@ class PostURLTests(TestCase):
             user=self.user_no_author,
             author=self.user_author
         )
+        worker.run_pending()
         response = self.no_author.get(
             reverse('posts:follow_index')
         )
@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from posts.models import Post, User
+from posts.utils import (CursorPaginator, decode_cursor, encode_cursor,
+                         page_window)
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text='Post' + str(i)) for i in range(25)
+        )
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_walk_forward_and_back(self):
+        """Курсоры проходят ленту вперёд и назад без пропусков."""
+        pagination = CursorPaginator(Post.objects.all(), 10)
+        pages = [pagination.page()]
+        while pages[-1].has_next():
+            pages.append(pagination.page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertEqual(
+            [post for page in pages for post in page], self.expected
+        )
+        back = pagination.page(pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        first = pagination.page(back.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+
+    def test_page_does_not_count_or_offset(self):
+        pagination = CursorPaginator(Post.objects.all(), 10)
+        cursor = pagination.page().next_cursor
+        with self.assertNumQueries(1) as queries:
+            list(CursorPaginator(Post.objects.all(), 10).page(cursor))
+        sql = queries.captured_queries[0]['sql']
+        self.assertNotIn('COUNT', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        pagination = CursorPaginator(Post.objects.all(), 10)
+        for cursor in (
+            'garbage',
+            encode_cursor([1], 5),
+            encode_cursor(['nope', 1], 2),
+            encode_cursor(['2020-01-01T00:00:00', 'abc'], 2),
+            encode_cursor([{'a': 1}, 1], 2),
+        ):
+            with self.subTest(cursor=cursor):
+                page = pagination.get_page(cursor)
+                self.assertEqual(page.number, 1)
+                self.assertEqual(list(page), self.expected[:10])
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user.username,)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_cursor_round_trip(self):
+        token = encode_cursor(['2022-09-08T16:47:00+00:00', 7], 3, True)
+        self.assertEqual(
+            decode_cursor(token), (['2022-09-08T16:47:00+00:00', 7], 3, True)
+        )
+
+    def test_approximate_count(self):
+        pagination = CursorPaginator(
+            Post.objects.all(), 10, approximate_count=True
+        )
+        self.assertEqual(pagination.count, 25)
+        self.assertEqual(pagination.estimated_num_pages, 3)
+
+    def test_view_follows_next_cursor(self):
+        response = self.client.get(reverse('posts:index'))
+        cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?cursor={cursor}')
+        response = self.client.get(reverse('posts:index'), {'cursor': cursor})
+        self.assertEqual(
+            list(response.context['page_obj']), self.expected[10:20]
+        )
+
+
+class PageWindowTests(SimpleTestCase):
+    def render(self, pages, number):
+        page = Paginator(range(pages * 10), 10).page(number)
+        return render_to_string(
+            'posts/includes/paginator.html',
+            {'page_obj': page, 'request': RequestFactory().get('/')},
+        )
+
+    def test_window_is_bounded(self):
+        page = Paginator(range(500000), 10).page(25000)
+        self.assertEqual(
+            page_window(page),
+            [1, None, 24998, 24999, 25000, 25001, 25002, None, 50000],
+        )
+        html = self.render(50000, 25000)
+        self.assertEqual(html.count('<li'), 11)
+        self.assertIn('page=50000', html)
+        self.assertIn('page=24999', html)
+
+    def test_links_do_not_grow_with_pages(self):
+        """Ссылок не больше окна при любом числе страниц."""
+        for pages in (10, 1000, 50000):
+            for number in (1, pages // 2, pages):
+                with self.subTest(pages=pages, number=number):
+                    html = self.render(pages, number)
+                    self.assertLessEqual(html.count('<li'), 11)
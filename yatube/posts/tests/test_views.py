@@ -1,13 +1,16 @@
 import shutil
 import tempfile
 
+from core.testing import run_on_commit
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Group, Post, User
+from jobs import worker
+from posts import signals
+from posts.models import Follow, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -54,6 +57,19 @@ class PostsPagesTests(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def test_pages_count_posts_without_profile(self):
+        cache.clear()
+        user = User.objects.create_user(username='NoProfile')
+        user.profile.delete()
+        post = Post.objects.create(text='Post', author=user)
+        for url in (
+            reverse('posts:profile', args=(user.username,)),
+            reverse('posts:post_detail', args=(post.id,)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.context['count'], 1)
+
     def test_pages_show_correct_context(self):
         """Index, group_list и profile сформированы с правильным контекстом"""
         adresses = (
@@ -200,3 +216,116 @@ class PaginatorViewsTests(TestCase):
             ) + '?page=2'
         )
         self.assertEqual(len(response.context['page_obj']), 3)
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.writer = User.objects.create_user(username='Writer')
+        for i in range(10):
+            author = User.objects.create_user(
+                username=f'Author{i}', first_name=f'Name{i}'
+            )
+            group = Group.objects.create(
+                description='Test', slug=f'feed{i}', title=f'Feed{i}'
+            )
+            Post.objects.create(author=author, group=group, text=f'Post{i}')
+            Post.objects.create(author=cls.writer, group=group, text='Post')
+            Follow.objects.create(user=cls.user, author=author)
+        worker.run_pending()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_views_do_not_query_per_post(self):
+        """Число запросов в лентах не зависит от числа постов."""
+        views_queries = (
+            (self.client, reverse('posts:index'), 2),
+            (
+                self.client,
+                reverse('posts:group_list', kwargs={'slug': 'feed0'}),
+                2
+            ),
+            (
+                self.client,
+                reverse('posts:profile', kwargs={'username': self.writer}),
+                3
+            ),
+            (self.authorized_client, reverse('posts:follow_index'), 4),
+        )
+        for client, url, queries in views_queries:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertTrue(response.context['page_obj'])
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Cached')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.group = Group.objects.create(
+            description='Test',
+            slug='cached',
+            title='Cached'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Cached post'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_are_cached_until_content_changes(self):
+        """Страницы берутся из кэша и сбрасываются при изменениях."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            self.client.get(url)
+            with self.subTest(url=url):
+                with self.assertNumQueries(0):
+                    self.client.get(url)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Свежий комментарий'},
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIsNotNone(response.context)
+
+    def test_new_post_is_visible_immediately(self):
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(author=self.user, text='Совсем новый пост')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Совсем новый пост')
+
+    def test_deleted_post_invalidation_reads_nothing(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(0):
+            signals.invalidate_deleted_post_pages(Post, post)
+        self.assertIsNotNone(self.client.get(url).context)
+
+    def test_pages_cached_before_commit_are_dropped(self):
+        url = reverse('posts:index')
+        Post.objects.create(author=self.user, text='Ещё не закоммичен')
+        # Читатель из другой транзакции кэширует страницу, пока пишущая
+        # транзакция не завершена.
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        run_on_commit()
+        self.assertIsNotNone(self.client.get(url).context)
@@ -0,0 +1,234 @@
+"""Миниатюры картинок постов, создаваемые вне запроса.
+
+После сохранения поста с новой картинкой миниатюры всех размеров из
+POST_THUMBNAIL_SIZES создаются фоновой задачей, а их адреса и
+размеры записываются в Post.thumbnails. Каждый размер нарезается по
+нескольким ширинам и форматам для srcset. Шаблоны читают только готовые
+адреса, поэтому при показе страниц картинки не открываются.
+"""
+import json
+import posixpath
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+from jobs.queue import task
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore
+
+from . import objects
+from .caching import bump_post
+from .models import Post
+
+# Файлы моложе этого возраста не удаляются: их пост мог появиться уже
+# после того, как обслуживание собрало список используемых файлов.
+ORPHAN_MIN_AGE: int = 60 * 60
+
+
+def formats():
+    """Форматы из настроек, которые установленный Pillow умеет сохранять.
+
+    Если ни один не подходит - JPEG, который Pillow сохраняет всегда:
+    у каждого размера должна остаться хотя бы одна миниатюра.
+    """
+    Image.init()
+    return [
+        format_ for format_ in settings.POST_THUMBNAIL_FORMATS
+        if format_ in Image.SAVE
+    ] or ['JPEG']
+
+
+def _variants(image, geometry, format_, options):
+    """Миниатюры одного размера и формата по ширинам, без повторов."""
+    width, height = map(int, geometry.split('x'))
+    widths = [w for w in settings.POST_THUMBNAIL_WIDTHS if w < width]
+    variants = {}
+    for w in [*sorted(widths), width]:
+        thumbnail = get_thumbnail(
+            image,
+            f'{w}x{round(height * w / width)}',
+            format=format_,
+            **options,
+        )
+        if not thumbnail.exists():
+            raise OSError(
+                f'Не удалось создать миниатюру {image.name} {geometry}'
+            )
+        # Без upscale маленькая картинка даёт одинаковые варианты.
+        variants.setdefault(thumbnail.width, thumbnail)
+    return list(variants.values())
+
+
+def render(name):
+    """Создаёт миниатюры картинки name; возвращает их описание.
+
+    Для каждого размера - адрес самой большой миниатюры в запасном
+    формате и наборы srcset для тега picture по всем форматам.
+    """
+    image = Post(image=name).image
+    thumbnails = {}
+    for size, (geometry, options) in settings.POST_THUMBNAIL_SIZES.items():
+        sources = []
+        for format_ in formats():
+            variants = _variants(image, geometry, format_, options)
+            sources.append({
+                'type': f'image/{format_.lower()}',
+                'srcset': ', '.join(
+                    f'{variant.url} {variant.width}w' for variant in variants
+                ),
+            })
+        largest = variants[-1]
+        thumbnails[size] = {
+            'url': largest.url,
+            'width': largest.width,
+            'height': largest.height,
+            'sources': sources,
+        }
+    return thumbnails
+
+
+@task
+def generate(post_id, name):
+    """Создаёт миниатюры и сохраняет их, если картинка поста не сменилась."""
+    thumbnails = render(name)
+    updated = Post.objects.filter(pk=post_id, image=name).update(
+        thumbnails=json.dumps(thumbnails)
+    )
+    if updated:
+        objects.posts.forget(post_id)
+        bump_post(post_id)
+    return thumbnails
+
+
+def schedule(post):
+    """Ставит создание миниатюр поста в очередь фоновых задач."""
+    generate.delay(post.pk, post.image.name)
+
+
+def _batches(queryset, fields, size):
+    """Строки (pk, *fields) пачками по size - без загрузки всей таблицы."""
+    queryset = queryset.order_by('pk')
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        batch = list(page.values_list('pk', *fields)[:size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][0]
+
+
+def _generate_safely(task):
+    post_id, name = task
+    try:
+        generate(post_id, name)
+    except Exception as error:
+        return post_id, str(error) or repr(error)
+    return post_id, None
+
+
+def regenerate(posts, workers=0, batch_size=100):
+    """Создаёт миниатюры постов, отдаёт пары (id поста, ошибка или None).
+
+    При workers > 0 пачки обрабатываются параллельно в пуле процессов.
+    """
+    batches = _batches(posts.exclude(image=''), ['image'], batch_size)
+    if not workers:
+        for batch in batches:
+            yield from map(_generate_safely, batch)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        for batch in batches:
+            # Процессы пула не должны унаследовать открытые соединения.
+            connections.close_all()
+            yield from pool.map(_generate_safely, batch)
+
+
+def _thumbnail_names(data):
+    """Имена файлов всех миниатюр из значения Post.thumbnails."""
+    urls = []
+    for thumbnail in json.loads(data).values():
+        urls.append(thumbnail['url'])
+        for source in thumbnail.get('sources', []):
+            urls += [
+                item.rsplit(' ', 1)[0]
+                for item in source['srcset'].split(', ')
+            ]
+    return {
+        unquote(url[len(settings.MEDIA_URL):])
+        for url in urls if url.startswith(settings.MEDIA_URL)
+    }
+
+
+def referenced(batch_size=1000):
+    """Имена картинок постов и их миниатюр, которые ещё используются."""
+    images, thumbnails = set(), set()
+    for batch in _batches(Post.objects, ['image', 'thumbnails'], batch_size):
+        for _, image, data in batch:
+            if image:
+                images.add(image)
+            thumbnails |= _thumbnail_names(data)
+    return images, thumbnails
+
+
+def walk(path, storage=default_storage):
+    """Имена всех файлов каталога хранилища вместе с подкаталогами."""
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from walk(posixpath.join(path, directory), storage)
+
+
+def orphans(images, thumbnails, storage=default_storage):
+    """Файлы картинок и миниатюр, на которые не ссылается ни один пост.
+
+    Отдаёт пары (имя, сирота ли файл) для всех просмотренных файлов.
+    """
+    deadline = time.time() - ORPHAN_MIN_AGE
+    sources = (
+        (Post._meta.get_field('image').upload_to, images),
+        (sorl_settings.THUMBNAIL_PREFIX, thumbnails),
+    )
+    for prefix, used in sources:
+        for name in walk(prefix.rstrip('/'), storage):
+            yield name, name not in used and (
+                storage.get_modified_time(name).timestamp() < deadline
+            )
+
+
+def clean_kvstore(deleted, present, batch_size=1000, dry_run=False):
+    """Убирает из KV-хранилища sorl записи о файлах, которых больше нет.
+
+    present - просмотренные и оставленные файлы, их наличие на диске не
+    проверяется повторно. Возвращает число удалённых ключей.
+    """
+    if not isinstance(default.kvstore, CachedDBStore):
+        if not dry_run:
+            default.kvstore.cleanup()
+        return 0
+    prefix = sorl_settings.THUMBNAIL_KEY_PREFIX
+    images = KVStore.objects.filter(key__startswith=f'{prefix}||image||')
+    removed = 0
+    for batch in _batches(images, ['value'], batch_size):
+        stale = []
+        for key, value in batch:
+            name = json.loads(value)['name']
+            if name in deleted or (
+                name not in present and not default_storage.exists(name)
+            ):
+                digest = key.rsplit('||', 1)[1]
+                stale += [key, f'{prefix}||thumbnails||{digest}']
+        if stale and not dry_run:
+            default.kvstore._delete_raw(*stale)
+        removed += len(stale) // 2
+    return removed
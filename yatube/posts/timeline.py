@@ -0,0 +1,182 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from jobs.queue import task
+
+from .models import Follow, Post, Profile, TimelineEntry
+from .utils import CursorPaginator
+
+BATCH_SIZE: int = 1000
+CELEBRITIES_KEY = 'timeline:celebrities'
+
+
+def celebrity_ids():
+    """Id авторов, чьи посты читаются из ленты через fan-out on read."""
+    ids = cache.get(CELEBRITIES_KEY)
+    if ids is None:
+        ids = frozenset(Profile.objects.filter(
+            follower_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('pk', flat=True))
+        cache.set(CELEBRITIES_KEY, ids, settings.FEED_CELEBRITIES_TIME)
+    return ids
+
+
+def follower_count_changed(author_id, delta):
+    """Ловит переход автора через FEED_FANOUT_LIMIT после сдвига счётчика.
+
+    Автор, переставший быть "знаменитостью", раскладывается по лентам
+    задним числом, иначе его посты выпали бы из лент. Переход замечает
+    тот запрос, что сдвинул счётчик, а не каждое чтение ленты.
+    """
+    count = Profile.objects.filter(pk=author_id).values_list(
+        'follower_count', flat=True
+    ).first()
+    if count is None:
+        return
+    limit = settings.FEED_FANOUT_LIMIT
+    if (count - delta > limit) == (count > limit):
+        return
+    cache.delete(CELEBRITIES_KEY)
+    if count <= limit:
+        fan_out_author.delay(author_id)
+
+
+def _insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _entries(posts, user_id):
+    for post_id, author_id, pub_date in posts.values_list(
+        'id', 'author_id', 'pub_date'
+    ).iterator():
+        yield TimelineEntry(
+            author_id=author_id,
+            post_id=post_id,
+            pub_date=pub_date,
+            user_id=user_id,
+        )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if post.author_id in celebrity_ids():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        TimelineEntry(
+            author_id=post.author_id,
+            post_id=post.id,
+            pub_date=post.pub_date,
+            user_id=user_id,
+        ) for user_id in followers.iterator()
+    )
+
+
+@task
+def fan_out_post(post_id):
+    """Фоновая раскладка нового поста, если его ещё не удалили."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        fan_out(post)
+
+
+@task
+def fan_out_author(author_id):
+    """Раскладывает все посты автора по лентам его подписчиков."""
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        follow(user_id, author_id)
+
+
+def follow(user_id, author_id):
+    """Добавляет посты автора в ленту нового подписчика."""
+    if author_id in celebrity_ids():
+        return
+    _insert(_entries(Post.objects.filter(author_id=author_id), user_id))
+
+
+@task
+def fill(user_id, author_id):
+    """Фоновое заполнение ленты подписчика, если подписка ещё есть."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        follow(user_id, author_id)
+
+
+def unfollow(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+@transaction.atomic
+def rebuild(user):
+    """Пересобирает ленту пользователя с нуля, возвращает число записей."""
+    TimelineEntry.objects.filter(user=user).delete()
+    posts = Post.objects.filter(
+        author__following__user=user
+    ).exclude(author__in=celebrity_ids())
+    _insert(_entries(posts, user.id))
+    return TimelineEntry.objects.filter(user=user).count()
+
+
+def followed_posts(user):
+    """Посты ленты подписок.
+
+    Основная часть читается из материализованной ленты пользователя,
+    посты авторов-знаменитостей подмешиваются при чтении.
+    """
+    condition = Q(pk__in=TimelineEntry.objects.filter(
+        user=user
+    ).values('post'))
+    celebrities = celebrity_ids()
+    if celebrities:
+        condition |= Q(author__in=_followed_celebrities(user, celebrities))
+    return Post.objects.filter(condition)
+
+
+def _followed_celebrities(user, celebrities):
+    return Follow.objects.filter(
+        user=user, author__in=celebrities
+    ).values('author')
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок по курсору, читаемая с индекса ленты.
+
+    Ключи страницы берутся из TimelineEntry по индексу (user, pub_date,
+    post) с LIMIT, к ним добавляется столько же постов знаменитостей по
+    индексу (author, pub_date, id); сами посты читаются тем же запросом
+    и сортируются уже в пределах этих двух порций.
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.feed(), per_page)
+        self.user = user
+
+    def _fetch(self, values, reverse, limit):
+        names = ('pub_date', 'post_id')
+        entries = TimelineEntry.objects.filter(user=self.user)
+        posts = Post.objects.all()
+        if values is not None:
+            entries = entries.filter(self._seek(values, reverse, names))
+            posts = posts.filter(self._seek(values, reverse))
+        condition = Q(pk__in=entries.order_by(
+            *self._ordering(reverse, names)
+        ).values('post')[:limit])
+        celebrities = celebrity_ids()
+        if celebrities:
+            condition |= Q(pk__in=posts.filter(
+                author__in=_followed_celebrities(self.user, celebrities)
+            ).order_by(*self._ordering(reverse)).values('pk')[:limit])
+        return list(self.object_list.filter(condition).order_by(
+            *self._ordering(reverse)
+        )[:limit])
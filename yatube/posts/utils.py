@@ -1,7 +1,240 @@
+import base64
+import binascii
+import hashlib
+import json
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+APPROXIMATE_COUNT_TIME: int = 60 * 5
+CURSOR_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('path',)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values, number, reverse=False):
+    """Упаковывает ключ строки и номер страницы в непрозрачный токен."""
+    payload = json.dumps(
+        {'v': values, 'n': number, 'r': reverse},
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    padding = '=' * (-len(token) % 4)
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + padding))
+        return list(data['v']), int(data['n']), bool(data['r'])
+    except (binascii.Error, KeyError, TypeError, ValueError):
+        raise InvalidCursor(token)
+
+
+def estimate_count(queryset):
+    """Приблизительное число записей.
+
+    Для всей таблицы в PostgreSQL берётся статистика планировщика,
+    в остальных случаях - COUNT(*), закэшированный на несколько минут.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    key = 'approximate_count:' + hashlib.md5(
+        str(queryset.query).encode()
+    ).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, APPROXIMATE_COUNT_TIME)
+    return count
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор по (pub_date, id).
+
+    Страница выбирается условием по ключу последней показанной записи
+    вместо OFFSET, поэтому глубокие страницы не медленнее первой, а
+    COUNT(*) не выполняется вовсе (или оценивается при approximate_count).
+    """
+
+    def __init__(self, object_list, per_page, ordering=CURSOR_ORDERING,
+                 approximate_count=False):
+        super().__init__(object_list, per_page)
+        self.ordering = ordering
+        self.approximate_count = approximate_count
+        self._num_pages = 1
+
+    @cached_property
+    def count(self):
+        if self.approximate_count:
+            return estimate_count(self.object_list)
+        return super().count
 
+    @property
+    def num_pages(self):
+        return self._num_pages
 
-def paginator(posts, SHOW_COUNT, request):
-    paginator = Paginator(posts, SHOW_COUNT)
+    @property
+    def estimated_num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def _field_names(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _keys(self, obj):
+        values = []
+        for name in self._field_names():
+            value = getattr(obj, name)
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        return values
+
+    def _seek(self, values, reverse, names=None):
+        """Условие "строго после ключа" в лексикографическом порядке.
+
+        names - поля другой модели с тем же ключом, например pub_date и
+        post у записей ленты вместо pub_date и id у постов.
+        """
+        opts = self.object_list.model._meta
+        condition = Q()
+        equal = Q()
+        for index, (name, value) in enumerate(zip(self.ordering, values)):
+            field = name.lstrip('-')
+            try:
+                value = opts.get_field(field).to_python(value)
+            except (TypeError, ValidationError):
+                # Токен разобран, но значение ключа не того типа.
+                raise InvalidCursor(values)
+            if names is not None:
+                field = names[index]
+            lookup = 'lt' if name.startswith('-') != reverse else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def _ordering(self, reverse, names=None):
+        """ordering (с полями names), перевёрнутый при reverse."""
+        ordering = []
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith('-') != reverse
+            field = name.lstrip('-') if names is None else names[index]
+            ordering.append('-' + field if descending else field)
+        return ordering
+
+    def _fetch(self, values, reverse, limit):
+        """Первые limit записей после ключа values в нужную сторону."""
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, reverse))
+        return list(queryset.order_by(*self._ordering(reverse))[:limit])
+
+    def page(self, cursor=None):
+        values, number, reverse = None, 1, False
+        if cursor:
+            values, number, reverse = decode_cursor(cursor)
+            if len(values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+        rows = self._fetch(values, reverse, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if values is not None and not rows:
+            return self.page()
+        if reverse:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = values is not None, has_more
+        if not has_previous:
+            number = 1
+        elif number < 2:
+            number = 2
+        self._num_pages = number + 1 if has_next else number
+        page = self._get_page(rows, number, self)
+        page.cursor = cursor or ''
+        page.next_cursor = (
+            encode_cursor(self._keys(rows[-1]), number + 1)
+            if has_next else ''
+        )
+        page.previous_cursor = (
+            encode_cursor(self._keys(rows[0]), number - 1, reverse=True)
+            if has_previous else ''
+        )
+        return page
+
+    def get_page(self, cursor):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+def page_window(page, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям, пропуски - None.
+
+    Список ограничен размером окна, сколько бы ни было страниц, поэтому
+    шаблон пагинатора не зависит от длины ленты.
+    """
+    number, num_pages = page.number, page.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    window = []
+    # Пропуск ставится, только если он скрывает больше одной страницы.
+    if number > on_each_side + on_ends + 2:
+        window += [*range(1, on_ends + 1), None]
+        window += range(number - on_each_side, number + 1)
+    else:
+        window += range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends - 1:
+        window += range(number + 1, number + on_each_side + 1)
+        window += [None, *range(num_pages - on_ends + 1, num_pages + 1)]
+    else:
+        window += range(number + 1, num_pages + 1)
+    return window
+
+
+def paginator(posts, SHOW_COUNT, request, approximate_count=False,
+              cursor_paginator=None):
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None and 'cursor' not in request.GET:
+        # Старые ссылки вида ?page=N продолжают работать через OFFSET.
+        return Paginator(posts, SHOW_COUNT).get_page(page_number)
+    if cursor_paginator is None:
+        cursor_paginator = CursorPaginator(
+            posts, SHOW_COUNT, approximate_count=approximate_count
+        )
+    return cursor_paginator.get_page(request.GET.get('cursor'))
+
+
+def comment_page(post, cursor=None, thread=None):
+    """Порция комментариев поста по курсору в порядке обхода веток.
+
+    Первая порция - COMMENTS_FIRST_PAGE комментариев, следующие - по
+    COMMENTS_PAGE_SIZE; авторы читаются тем же запросом. thread
+    ограничивает выборку веткой этого комментария.
+    """
+    size = settings.COMMENTS_PAGE_SIZE
+    if not cursor:
+        size = settings.COMMENTS_FIRST_PAGE
+    comments = post.comments.select_related('author')
+    if thread is not None:
+        comments = comments.subtree(thread)
+    return CursorPaginator(
+        comments.order_by(*COMMENT_ORDERING), size, ordering=COMMENT_ORDERING
+    ).get_page(cursor)
@@ -1,11 +1,16 @@
+from core.db.replicas import replica_reads
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
-from yatube.settings import CACHE_TIME
 
-from .forms import CommentForm, GroupForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import paginator
+from . import objects
+from .caching import (author_scope, cache_generations, conditional,
+                      post_author, slug_scope, username_scope)
+from .forms import CommentForm, GroupForm, PostForm, ReplyForm
+from .models import Comment, Follow, Group, Post, Profile, User
+from .search import SearchPaginator
+from .timeline import TimelinePaginator, followed_posts
+from .utils import comment_page, paginator
 
 SHOW_COUNT: int = 10
 
@@ -13,21 +18,21 @@ SHOW_COUNT: int = 10
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    form = CommentForm(request.POST or None)
+    form = ReplyForm(request.POST or None, instance=Comment(post=post))
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
-        comment.post = post
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user
+    posts = followed_posts(request.user).feed()
+    page_obj = paginator(
+        posts, SHOW_COUNT, request,
+        cursor_paginator=TimelinePaginator(request.user, SHOW_COUNT),
     )
-    page_obj = paginator(posts, SHOW_COUNT, request)
     context = {
         'page_obj': page_obj,
         'index_header': True
@@ -54,6 +59,8 @@ def group_create(request):
 
 @login_required
 def group_edit(request, slug):
+    # Группа сохраняется обратно, поэтому читается из базы, а не из
+    # кэша объектов, где она может быть устаревшей.
     group = get_object_or_404(Group, slug=slug)
     form = GroupForm(
         request.POST or None,
@@ -78,9 +85,12 @@ def group_delete(request, slug):
     return redirect('posts:groups')
 
 
+@replica_reads
+@conditional(lambda request, slug: [slug_scope(slug)], per_session=True)
+@cache_generations(lambda slug: [slug_scope(slug)])
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    group = objects.groups.get_or_404(slug)
+    posts = group.posts.feed()
     page_obj = paginator(posts, SHOW_COUNT, request)
     context = {
         'group': group,
@@ -89,6 +99,7 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@replica_reads
 def groups(request):
     groups = Group.objects.all
     context = {
@@ -98,10 +109,12 @@ def groups(request):
     return render(request, 'posts/groups.html', context)
 
 
-@cache_page(CACHE_TIME, key_prefix='index_page')
+@replica_reads
+@conditional(lambda request: ['posts'], per_session=True)
+@cache_generations(lambda: ['posts'])
 def index(request):
-    posts = Post.objects.all()
-    page_obj = paginator(posts, SHOW_COUNT, request)
+    posts = Post.objects.feed()
+    page_obj = paginator(posts, SHOW_COUNT, request, approximate_count=True)
     context = {
         'page_obj': page_obj,
         'index_header': True,
@@ -110,6 +123,41 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+def _post_count(author):
+    """Число постов из профиля; у пользователя без профиля - запросом."""
+    try:
+        return author.profile.post_count
+    except Profile.DoesNotExist:
+        return author.posts.count()
+
+
+def _post_scopes(post_id):
+    return [f'post:{post_id}', author_scope(post_author(post_id))]
+
+
+def _thread(request, post):
+    """Комментарий из ?thread=, ветку которого нужно показать."""
+    thread_id = request.GET.get('thread', '')
+    if not thread_id.isdigit():
+        return None
+    return get_object_or_404(post.comments, pk=thread_id)
+
+
+@replica_reads
+@conditional(lambda request, post_id: _post_scopes(post_id))
+@cache_generations(_post_scopes)
+def post_comments(request, post_id):
+    """Следующая порция комментариев HTML-фрагментом для подгрузки."""
+    post = objects.posts.get_or_404(post_id)
+    thread = _thread(request, post)
+    context = {
+        'comments': comment_page(post, request.GET.get('cursor'), thread),
+        'post': post,
+        'thread': thread,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -136,18 +184,27 @@ def post_delete(request, post_id):
     return redirect('posts:profile', request.user.username)
 
 
+@replica_reads
+@conditional(
+    lambda request, post_id: _post_scopes(post_id), per_session=True
+)
+@cache_generations(_post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all().order_by('created')
-    count = post.author.posts.count()
+    post = objects.posts.get_or_404(post_id)
+    thread = _thread(request, post)
+    comments = comment_page(post, request.GET.get('comments'), thread)
+    count = _post_count(post.author)
     form = CommentForm(
         request.POST or None
     )
+    reply = request.GET.get('reply', '')
     context = {
         'comments': comments,
         'count': count,
         'form': form,
         'post': post,
+        'reply': reply if reply.isdigit() else '',
+        'thread': thread,
     }
     return render(request, 'posts/post_detail.html', context)
 
@@ -175,11 +232,16 @@ def post_edit(request, post_id):
     return redirect('posts:post_detail', post.id)
 
 
+@replica_reads
+@conditional(
+    lambda request, username: [username_scope(username)], per_session=True
+)
+@cache_generations(lambda username: [username_scope(username)])
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = objects.users.get_or_404(username)
+    posts = author.posts.feed()
     page_obj = paginator(posts, SHOW_COUNT, request)
-    count = posts.count()
+    count = _post_count(author)
     following = author.following.filter(user=request.user.id).exists()
     context = {
         'author': author,
@@ -194,10 +256,14 @@ def profile(request, username):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    following = request.user.follower.filter(author=author).exists()
-    if request.user != author and not following:
-        follow = Follow(user=request.user, author=author)
-        follow.save()
+    if request.user != author:
+        # Повторная подписка упирается в уникальность (user, author):
+        # один INSERT вместо проверки exists() и гонки между ними.
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+        except IntegrityError:
+            pass
     return redirect('posts:profile', username)
 
 
@@ -209,3 +275,18 @@ def profile_unfollow(request, username):
     )
     follow.delete()
     return redirect('posts:profile', username)
+
+
+@cache_generations(lambda: ['posts'])
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = SearchPaginator(query, SHOW_COUNT).get_page(
+            request.GET.get('cursor')
+        )
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+    }
+    return render(request, 'posts/search.html', context)
@@ -0,0 +1,23 @@
+// Кнопка «Показать ещё» подгружает следующую порцию комментариев на
+// место себя; без JavaScript ссылка открывает порцию на странице поста.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('[data-comments-url]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.dataset.commentsUrl, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.insertAdjacentHTML('afterend', html);
+      link.remove();
+    })
+    .catch(function () {
+      window.location.href = link.href;
+    });
+});
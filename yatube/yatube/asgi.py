@@ -0,0 +1,21 @@
+"""
+ASGI config for Yatube project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``; Django itself runs in a pool of ASGI_THREADS threads
+behind core.asgi.WsgiBridge. Run it with any ASGI server, for example::
+
+    uvicorn yatube.asgi:application --workers 4
+"""
+
+import os
+
+from core.asgi import WsgiBridge
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+django_application = get_wsgi_application()
+
+application = WsgiBridge(django_application, settings.ASGI_THREADS)
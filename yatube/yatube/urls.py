@@ -1,3 +1,4 @@
+from core.views import cache_metrics, metrics
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
@@ -11,8 +12,11 @@ urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
     path('admin/', admin.site.urls),
+    path('api/', include('api.urls', namespace='api')),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('metrics/', metrics, name='metrics'),
+    path('metrics/cache/', cache_metrics, name='cache_metrics'),
 ]
 
 if settings.DEBUG: